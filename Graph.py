@@ -1,28 +1,205 @@
 import os
-import sys
+import argparse
+import glob
 import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import matplotlib.pyplot as plt
+import numpy as np
+from SessionStore import (COLUMNS_EXT, JOURNAL_EXT, MAX_PLOT_POINTS, TIERS_EXT, load_tier, parse_duration, read_tiers,
+                          stream_columns)
 
-def load_telemetry_data(json_path):
-    with open(json_path, "r") as f:
-        data = json.load(f)
-    return data.get("history", []), data.get("ssid", "Unknown")
+def load_telemetry_data(json_path, start=None, end=None, tier=None, max_points=MAX_PLOT_POINTS, last=None):
+    """Return (columns, ssid, tier) limited to [start, end] seconds of the session.
 
-def create_and_save_plot(json_path, history, ssid):
-    if not history:
-        print("[!] No history data found.")
-        return
+    ``last`` keeps only that many seconds before the end of the session.
+    Tiered stores pick the finest tier that covers the range (or ``tier``)
+    and return its name; other formats return None as the tier.
+    """
+    json_path = json_path.rstrip("/\\")
+    if json_path.endswith(TIERS_EXT):
+        if last is not None:
+            _, tiers = read_tiers(json_path)
+            start = max((cols["t"][-1] for cols in tiers.values() if len(cols["t"])), default=0.0) - last
+        return load_tier(json_path, start, end, tier, max_points)
+    columns, ssid = stream_columns(json_path)
+    columns = {name: np.asarray(col) for name, col in columns.items()}
+    times = columns.get("t", np.empty(0))
+    if last is not None and len(times):
+        start = times[-1] - last
+    if start is None and end is None:
+        return columns, ssid, None
+    # Samples are in time order, so the range is one contiguous slice
+    lo = 0 if start is None else np.searchsorted(times, start, "left")
+    hi = len(times) if end is None else np.searchsorted(times, end, "right")
+    return {name: col[lo:hi] for name, col in columns.items()}, ssid, None
 
-    times = [t for t, _, _ in history]
-    downloads = [d for _, d, _ in history]
-    uploads = [u for _, _, u in history]
+# Batch mode remembers what it rendered, per source directory
+CACHE_MANIFEST = ".graph_cache.json"
+# Preferred source when a session exists in several formats
+SESSION_EXTS = [TIERS_EXT, COLUMNS_EXT, JOURNAL_EXT, ".json"]
 
-    # Output path setup
-    output_folder = os.path.dirname(os.path.abspath(json_path))
-    ssid_clean = ssid.replace(" ", "_")
+def png_path_for(json_path):
+    json_path = json_path.rstrip("/\\")
     base_filename = os.path.splitext(os.path.basename(json_path))[0]
-    png_path = os.path.join(output_folder, f"{base_filename}.png")
+    return os.path.join(os.path.dirname(os.path.abspath(json_path)), f"{base_filename}.png")
+
+def source_mtime(path):
+    # Store directories change through the files inside them
+    if os.path.isdir(path):
+        return max((e.stat().st_mtime for e in os.scandir(path)), default=os.path.getmtime(path))
+    return os.path.getmtime(path)
+
+def is_session_file(path):
+    name = os.path.basename(path.rstrip("/\\"))
+    if name.endswith(".json"):
+        # Side outputs that live next to the sessions
+        return not (name.endswith("_bufferbloat.json") or name.startswith("calibration_") or name == CACHE_MANIFEST)
+    return name.endswith((JOURNAL_EXT, COLUMNS_EXT, TIERS_EXT))
+
+def find_sessions(patterns):
+    """Expand directories and globs into session paths, one per session."""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern) and not is_session_file(pattern):
+            found.extend(os.path.join(pattern, name) for name in os.listdir(pattern))
+        elif glob.has_magic(pattern):
+            found.extend(glob.glob(pattern))
+        else:
+            found.append(pattern)
+    by_base = {}
+    for path in found:
+        path = path.rstrip("/\\")
+        if not is_session_file(path):
+            continue
+        base, ext = os.path.splitext(path)
+        best = by_base.get(base)
+        if best is None or SESSION_EXTS.index(ext) < SESSION_EXTS.index(os.path.splitext(best)[1]):
+            by_base[base] = path
+    return sorted(by_base.values())
+
+def render_session(json_path, options):
+    """Worker: load and plot one session. Returns (path, png, tier, seconds, error)."""
+    began = time.perf_counter()
+    tier = None
+    try:
+        columns, ssid, tier = load_telemetry_data(json_path, options["start"], options["end"], options["tier"],
+                                                  options["max_points"], options["last"])
+        png_path = create_and_save_plot(json_path, columns, ssid, options["points"])
+        error = None if png_path else "no history data"
+    except Exception as e:
+        png_path = None
+        error = str(e)
+    return json_path, png_path, tier, time.perf_counter() - began, error
+
+def load_manifest(folder):
+    try:
+        with open(os.path.join(folder, CACHE_MANIFEST), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(folder, manifest):
+    path = os.path.join(folder, CACHE_MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+def run_batch(sessions, options, jobs, force=False):
+    manifests = {}
+    mtimes = {}
+    pending = []
+    skipped = 0
+    for path in sessions:
+        folder = os.path.dirname(os.path.abspath(path))
+        manifest = manifests.setdefault(folder, load_manifest(folder))
+        entry = manifest.get(os.path.basename(path))
+        png_path = png_path_for(path)
+        # Taken before rendering, so a session written to meanwhile is rendered again next time
+        mtimes[path] = mtime = source_mtime(path)
+        if entry is not None:
+            fresh = (entry.get("source_mtime") == mtime and entry.get("options") == options
+                     and os.path.exists(png_path))
+        else:
+            # Plotted outside batch mode, e.g. by the monitor at exit
+            fresh = os.path.exists(png_path) and os.path.getmtime(png_path) >= mtime
+        if not force and fresh:
+            skipped += 1
+            continue
+        pending.append(path)
+    print(f"[i] {len(sessions)} sessions: {len(pending)} to render, {skipped} up to date")
+    began = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(render_session, path, options) for path in pending]
+        for future in as_completed(futures):
+            path, png_path, tier, seconds, error = future.result()
+            name = os.path.basename(path)
+            if error:
+                failed += 1
+                print(f"[!] {name}: {error} ({seconds:.2f}s)")
+                continue
+            via = f", tier '{tier}'" if tier else ""
+            print(f"[✓] {name} -> {os.path.basename(png_path)} ({seconds:.2f}s{via})")
+            folder = os.path.dirname(os.path.abspath(path))
+            manifests[folder][name] = {
+                "png": os.path.basename(png_path),
+                "source_mtime": mtimes[path],
+                "options": options,
+                "seconds": round(seconds, 3),
+            }
+    for folder, manifest in manifests.items():
+        save_manifest(folder, manifest)
+    print(f"[i] Rendered {len(pending) - failed}, skipped {skipped}, failed {failed} "
+          f"in {time.perf_counter() - began:.2f}s with {jobs} workers")
+
+def lttb(x, y, threshold):
+    """Indices of ``threshold`` points chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept; every bucket in between contributes
+    the point forming the largest triangle with the previously kept point
+    and the mean of the next bucket, which preserves peaks and dips.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    bounds = np.append(edges, n)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = bounds[i + 1], bounds[i + 2]
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+def bucket_range(x, lo, hi, buckets):
+    """Per-bucket min of ``lo`` and max of ``hi``, for shading a downsampled band."""
+    if buckets >= len(x):
+        return x, lo, hi
+    starts = np.linspace(0, len(x), buckets, endpoint=False).astype(np.int64)
+    return x[starts], np.minimum.reduceat(lo, starts), np.maximum.reduceat(hi, starts)
+
+def create_and_save_plot(json_path, columns, ssid, points=None):
+    # Columnar stores come back as memoryviews over mmap; asarray wraps them without copying
+    times = np.asarray(columns.get("t", []))
+    downloads = np.asarray(columns.get("download", []))
+    uploads = np.asarray(columns.get("upload", []))
+    if not len(times):
+        return None
+
+    # Output path setup
+    png_path = png_path_for(json_path)
 
     # Plotting with dark mode theme
     plt.style.use("dark_background")
@@ -30,8 +207,19 @@ def create_and_save_plot(json_path, history, ssid):
     fig.patch.set_facecolor("#222326")
     ax.set_facecolor("#222326")
 
-    ax.plot(times, downloads, label="Download (Mbps)", color="magenta", linewidth=2)
-    ax.plot(times, uploads, label="Upload (Mbps)", color="lime", linewidth=2)
+    # More points than two per pixel column only cost render time
+    if points is None:
+        points = 2 * int(ax.get_window_extent().width)
+    dl_keep = lttb(times, downloads, points) if points else slice(None)
+    ul_keep = lttb(times, uploads, points) if points else slice(None)
+    ax.plot(times[dl_keep], downloads[dl_keep], label="Download (Mbps)", color="magenta", linewidth=2)
+    ax.plot(times[ul_keep], uploads[ul_keep], label="Upload (Mbps)", color="lime", linewidth=2)
+    # Rollup tiers carry the range of each bucket
+    if "download_min" in columns:
+        for name, color in (("download", "magenta"), ("upload", "lime")):
+            band = bucket_range(times, np.asarray(columns[f"{name}_min"]), np.asarray(columns[f"{name}_max"]),
+                                points or len(times))
+            ax.fill_between(*band, color=color, alpha=0.2, linewidth=0)
 
     ax.set_xlabel("Time (s)", color="white")
     ax.set_ylabel("Speed (Mbps)", color="white")
@@ -48,22 +236,60 @@ def create_and_save_plot(json_path, history, ssid):
     plt.tight_layout()
     plt.savefig(png_path)
     plt.close()
-
-    print(f"[✓] Plot saved to: {png_path}")
+    return png_path
 
 def main():
-    if len(sys.argv) != 2 or not sys.argv[1].endswith(".json"):
-        print("Usage: python graph.py <namefile>.json")
+    parser = argparse.ArgumentParser(description="Plot NetBench/NetScope sessions")
+    parser.add_argument("path", nargs="+",
+                        help=f"Session file (<name>.json|{JOURNAL_EXT}|{COLUMNS_EXT}|{TIERS_EXT}), "
+                             "or directories / globs to render in batch")
+    parser.add_argument("--start", type=parse_duration, default=None,
+                        help="Plot from this session time (e.g. 3600, 90m, 2d)")
+    parser.add_argument("--end", type=parse_duration, default=None, help="Plot up to this session time")
+    parser.add_argument("--last", type=parse_duration, default=None,
+                        help="Plot only the last DURATION of the session (e.g. 6h)")
+    parser.add_argument("--tier", default=None, help="Force a tier of a tiered store (raw, 10s, 1m, 1h)")
+    parser.add_argument("--max-points", type=int, default=MAX_PLOT_POINTS,
+                        help="Point budget used to pick a tier")
+    parser.add_argument("--points", type=int, default=None,
+                        help="Downsample each line to N points with LTTB (default: 2 per pixel column, 0 = off)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Batch mode worker processes")
+    parser.add_argument("--force", action="store_true", help="Batch mode: re-render up-to-date sessions too")
+    args = parser.parse_args()
+
+    options = {
+        "start": args.start,
+        "end": args.end,
+        "last": args.last,
+        "tier": args.tier,
+        "max_points": args.max_points,
+        "points": args.points,
+    }
+    single = args.path[0]
+    if len(args.path) > 1 or glob.has_magic(single) or (os.path.isdir(single) and not is_session_file(single)):
+        sessions = find_sessions(args.path)
+        if not sessions:
+            print("[!] No sessions found.")
+            return
+        run_batch(sessions, options, max(1, args.jobs), args.force)
         return
 
-    json_path = sys.argv[1]
+    json_path = single
+    if not json_path.rstrip("/\\").endswith((".json", JOURNAL_EXT, COLUMNS_EXT, TIERS_EXT)):
+        parser.error(f"expected a .json, {JOURNAL_EXT}, {COLUMNS_EXT} or {TIERS_EXT} path")
     if not os.path.exists(json_path):
         print(f"[!] File not found: {json_path}")
         return
 
     try:
-        history, ssid = load_telemetry_data(json_path)
-        create_and_save_plot(json_path, history, ssid)
+        columns, ssid, tier = load_telemetry_data(json_path, args.start, args.end, args.tier, args.max_points, args.last)
+        if tier:
+            print(f"[i] Using tier '{tier}' ({len(columns['t'])} points)")
+        png_path = create_and_save_plot(json_path, columns, ssid, args.points)
+        if png_path:
+            print(f"[✓] Plot saved to: {png_path}")
+        else:
+            print("[!] No history data found.")
     except Exception as e:
         print(f"[!] Error: {e}")
 
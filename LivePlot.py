@@ -0,0 +1,134 @@
+import os
+import threading
+from array import array
+
+BACKGROUND = "#23272e"
+# Fields of each point in the flat point buffer
+T, WEIGHT, DL, DL_MIN, DL_MAX, UL, UL_MIN, UL_MAX = range(8)
+WIDTH = 8
+
+
+class LivePlot:
+    """Session speed plot that lives for the whole run.
+
+    Samples go into a preallocated point buffer. When it fills up, adjacent
+    points are merged pairwise (mean, min, max) and later samples are
+    merged at the same coarser resolution, so the whole session always fits
+    in ``capacity`` points. The figure, lines and axes are created once;
+    ``snapshot`` only swaps the line data and writes a PNG, so it can run
+    periodically and at exit without reading the session files back.
+    The buffer is a flat array, and matplotlib (with numpy) is imported on
+    the first snapshot, so neither costs anything at startup.
+    """
+
+    def __init__(self, title, capacity=4096):
+        self.capacity = capacity - capacity % 2
+        self._points = array("d", [0.0]) * (self.capacity * WIDTH)
+        self._count = 0
+        self._stride = 1  # samples per point
+        self._lock = threading.Lock()
+        self._draw_lock = threading.Lock()  # periodic and exit snapshots may overlap
+        self._bands = []
+        self.title = title
+        self.figure = None
+
+    def _create_figure(self):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        self.figure = Figure(figsize=(10, 5))
+        self.canvas = FigureCanvasAgg(self.figure)
+        ax = self.axes = self.figure.add_subplot()
+        self.figure.patch.set_facecolor(BACKGROUND)
+        ax.set_facecolor(BACKGROUND)
+        self._dl_line, = ax.plot([], [], label="Download (Mbps)", color="magenta")
+        self._ul_line, = ax.plot([], [], label="Upload (Mbps)", color="lime")
+        ax.set_xlabel("Time (s)", color="white")
+        ax.set_ylabel("Speed (Mbps)", color="white")
+        ax.set_title(self.title, color="white")
+        ax.legend(facecolor=BACKGROUND, edgecolor="white", labelcolor="white", loc="upper left")
+        ax.grid(True, color="white", alpha=0.2)
+        ax.tick_params(axis="x", colors="white")
+        ax.tick_params(axis="y", colors="white")
+        for spine in ax.spines.values():
+            spine.set_color("white")
+        self.figure.tight_layout()
+
+    def append(self, t, download, upload):
+        with self._lock:
+            n = self._count
+            p = self._points
+            i = (n - 1) * WIDTH
+            if n and p[i + WEIGHT] < self._stride:
+                w = p[i + WEIGHT]
+                p[i + DL] = (p[i + DL] * w + download) / (w + 1)
+                p[i + UL] = (p[i + UL] * w + upload) / (w + 1)
+                p[i + DL_MIN] = min(p[i + DL_MIN], download)
+                p[i + DL_MAX] = max(p[i + DL_MAX], download)
+                p[i + UL_MIN] = min(p[i + UL_MIN], upload)
+                p[i + UL_MAX] = max(p[i + UL_MAX], upload)
+                p[i + WEIGHT] = w + 1
+                return
+            if n == self.capacity:
+                self._compact()
+                n = self._count
+            i = n * WIDTH
+            p[i:i + WIDTH] = array("d", (t, 1, download, download, download, upload, upload, upload))
+            self._count = n + 1
+
+    def _compact(self):
+        p = self._points
+        merged = array("d")
+        for i in range(0, self.capacity * WIDTH, 2 * WIDTH):
+            j = i + WIDTH
+            wa, wb = p[i + WEIGHT], p[j + WEIGHT]
+            w = wa + wb
+            merged.extend((
+                p[i + T],
+                w,
+                (p[i + DL] * wa + p[j + DL] * wb) / w,
+                min(p[i + DL_MIN], p[j + DL_MIN]),
+                max(p[i + DL_MAX], p[j + DL_MAX]),
+                (p[i + UL] * wa + p[j + UL] * wb) / w,
+                min(p[i + UL_MIN], p[j + UL_MIN]),
+                max(p[i + UL_MAX], p[j + UL_MAX]),
+            ))
+        half = self.capacity // 2
+        p[:half * WIDTH] = merged
+        self._count = half
+        self._stride *= 2
+
+    def snapshot(self, png_path):
+        """Redraw with the current points and write ``png_path`` atomically."""
+        with self._lock:
+            points = self._points[:self._count * WIDTH]
+            merged = self._stride > 1
+        if not points:
+            return False
+        with self._draw_lock:
+            self._draw(points, merged, png_path)
+        return True
+
+    def _draw(self, points, merged, png_path):
+        if self.figure is None:
+            self._create_figure()
+        ax = self.axes
+        t = points[T::WIDTH]
+        self._dl_line.set_data(t, points[DL::WIDTH])
+        self._ul_line.set_data(t, points[UL::WIDTH])
+        for band in self._bands:
+            band.remove()
+        self._bands = []
+        if merged:
+            # Each point stands for several samples; shade their range
+            self._bands.append(ax.fill_between(t, points[DL_MIN::WIDTH], points[DL_MAX::WIDTH],
+                                               color="magenta", alpha=0.2, linewidth=0))
+            self._bands.append(ax.fill_between(t, points[UL_MIN::WIDTH], points[UL_MAX::WIDTH],
+                                               color="lime", alpha=0.2, linewidth=0))
+        # Limits from the data itself; relim() would ignore the bands
+        t0, t1 = t[0], t[-1]
+        ax.set_xlim(t0, t1 if t1 > t0 else t0 + 1)
+        ax.set_ylim(0, max(max(points[DL_MAX::WIDTH]), max(points[UL_MAX::WIDTH]), 0.001) * 1.05)
+        root, ext = os.path.splitext(png_path)
+        tmp_path = f"{root}.tmp{ext}"
+        self.canvas.print_png(tmp_path)
+        os.replace(tmp_path, png_path)
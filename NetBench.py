@@ -1,25 +1,28 @@
+from Startup import install_traceback, startup  # first, so the startup clock covers every import
 import os
 import time
 import threading
 import psutil
-import requests
 import socket
 import argparse
 import json
-from ping3 import ping
 from datetime import datetime
-from rich.live import Live
 from rich.table import Table
 from rich.panel import Panel
 from rich import box
 from rich.console import Console
-from rich.prompt import Prompt
-from rich.traceback import install
 from rich.text import Text  # Tambahkan ini
-import matplotlib
-matplotlib.use("Agg")  # Tambahkan ini sebelum import pyplot
-import matplotlib.pyplot as plt
-import speedtest
+from Prober import PROBE_MODES, LatencyProber
+from NetWatch import NetworkWatcher
+from ProcNet import (ProcessBandwidth, connection_stats, default_gateway, default_route_interface, freq_to_channel,
+                     interface_master, is_linux, link_state, wifi_info)
+from LivePlot import LivePlot
+from RingBuffer import RingBuffer
+from Sketch import QuantileSketch
+from Scheduler import CollectorScheduler, Ticker
+from Traffic import DEFAULT_DOWNLOAD_URLS, DEFAULT_UPLOAD_URL, AsyncTrafficEngine, DownloadEngine, local_server_url
+from SessionStore import (DEFAULT_TIERS, JOURNAL_EXT, SESSION_FIELDS, BackgroundWriter, CsvLog, open_session_store,
+                          parse_retention, write_snapshot)
 import subprocess
 import sys  # Tambahkan ini
 
@@ -29,8 +32,9 @@ if getattr(sys, 'frozen', False):
 else:
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
-install()
+install_traceback()
 console = Console()
+startup.mark("imports")
 current_dir = os.getcwd()
 
 # === Global Telemetry ===
@@ -52,6 +56,8 @@ telemetry_data = {
     "latency": 0.0,
     "jitter": 0.0,
     "packet_loss": 0.0,
+    "sketches": {name: QuantileSketch() for name in ("download", "upload", "rtt", "jitter")},  # session-wide, Mbps and ms
+    "probes": {},  # label -> host, rtt, mean, p50/p95/p99, jitter (RFC 3550), loss, sent, received, error
     "sent": 0.0,
     "recv": 0.0,
     "cpu": 0.0,
@@ -59,27 +65,79 @@ telemetry_data = {
     "rssi": "Unknown",
     "channel": "Unknown",
     "frequency": "Unknown",
-    "process_bandwidth": [],  # list of (pid, name, up_mbps, down_mbps)
+    "link": "Unknown",
+    "nics": {},  # --all-interfaces: name -> {download, upload, errors, drops, counters} or None when gone
+    "network_changes": [],  # session boundaries: {"t", "time", "kinds", "changed": {field: [old, new]}}
+    "process_bandwidth": [],  # list of (pid, name, up_mbps, down_mbps), TCP only, Linux only
     "active_tcp": 0,
     "active_udp": 0,
+    "tcp_states": {},  # e.g. {"ESTABLISHED": 12, "TIME_WAIT": 3}
+    "process_cache": {},  # pids, hits, new, evicted, fd_scans, unowned, scan_ms of the last process scan
     "errors_in": 0,
     "errors_out": 0,
     "drop_in": 0,
     "drop_out": 0,
-    "history": [],  # [(time, d_mbps, u_mbps)]
+    "history": RingBuffer(["t", "download", "upload"], 3600),  # time, d_mbps, u_mbps columns
     "upload_test_speed": 0.0,  # bps
     "upload_test_running": False,
+    "upload_test_streams": [],  # bps per connection, last interval
+    "upload_test_bytes": 0,  # bytes acknowledged by the endpoint
+    "upload_test_errors": 0,
     "speedtest_download": 0.0,
     "speedtest_upload": 0.0,
+    "traffic": {"aggregate_bps": 0.0, "streams": [], "bytes": 0, "errors": 0, "cpu_pct": 0.0, "cpu_per_gbps": 0.0, "bytes_per_cpu_pct": 0.0},  # stress download
+    "sample_interval": 1.0,  # seconds
+    "collectors": {},  # name -> interval, updated (epoch), duration, lateness, missed, errors
 }
 
 start_time = time.time()
+start_monotonic = time.monotonic()
 initial_sent = 0
 initial_recv = 0
+old_sent = 0
+old_recv = 0
+old_read = 0.0
+process_bandwidth = None
 interface = None
+all_interfaces = False
+monitored_nics = []  # --all-interfaces: every interface that was up at start
+aggregate_nics = []  # the ones summed into download/upload (bond and bridge members are not)
+nic_masters = {}
+NIC_FIELDS = ("download", "upload", "errors", "drops")
+nic_counters = {}
+old_nic_counters = {}
+total_counters = None
 alert_threshold = 1.0  # Mbps
 save_interval = 300  # seconds
+json_snapshot = False  # also rewrite the JSON snapshot every save_interval, not only at exit
+history_format = "jsonl"  # jsonl, columns or tiered
+history_tiers = list(DEFAULT_TIERS)  # (name, bucket s, retention s) for the tiered format
+flush_interval = 1.0  # seconds between history flushes
+fsync_policy = "never"  # never, interval or always
+write_queue_size = 4096  # rows buffered before the sampler starts dropping
 history_limit = 60  # number of points for sparkline
+sample_interval = 1.0  # seconds between interface counter reads
+system_interval = 1.0  # CPU, memory, interface errors
+connections_interval = 5.0  # TCP/UDP connection counts
+processes_interval = 10.0  # per-process bandwidth scan
+probe_hosts = ["8.8.8.8"]  # probed alongside the gateway and DNS servers; the first one drives Latency/Jitter/Loss
+probe_rate = 5.0  # probes per second per target
+probe_window = 100  # probes in the loss/percentile window
+probe_mode = "auto"  # auto, icmp or udp
+latency_prober = None
+primary_probe_label = None
+bufferbloat_rate = 20.0  # probes per second per target during the latency-under-load test
+upload_url = DEFAULT_UPLOAD_URL  # or "local"
+upload_connections = 4
+upload_duration = 10.0  # seconds
+traffic_urls = list(DEFAULT_DOWNLOAD_URLS)
+traffic_streams = 4
+traffic_target_bps = 0.0  # 0 = unlimited
+traffic_engine = "asyncio"  # asyncio (one event loop) or threads (one requests session per stream)
+traffic_recv_mode = "zerocopy"  # zerocopy (recv_into a preallocated buffer) or stream
+traffic_rcvbuf = 0  # SO_RCVBUF bytes, 0 = OS default
+traffic_sndbuf = 0  # SO_SNDBUF bytes, 0 = OS default
+history_capacity = 3600  # samples kept in memory
 
 # === Utility functions ===
 def format_speed(bps):
@@ -107,6 +165,7 @@ def ascii_sparkline(data, width=30):
 
 # Get public IP and geolocation every 10 minutes
 def update_public_ip():
+    requests = startup.lazy_import("requests")
     while True:
         try:
             resp = requests.get("https://api.ipify.org?format=json", timeout=5)
@@ -118,37 +177,54 @@ def update_public_ip():
             telemetry_data["public_ip"] = "Unknown"
             telemetry_data["country"] = "Unknown"
             telemetry_data["city"] = "Unknown"
-        time.sleep(600)
+        # Re-queried early when the address or gateway changes
+        public_ip_refresh.wait(600)
+        public_ip_refresh.clear()
 
-# Calculate jitter and packet loss via repeated ping
-def update_ping_stats():
-    count = 10
-    interval = 0.2
-    while True:
-        rtts = []
-        lost = 0
-        for _ in range(count):
-            res = ping("8.8.8.8", unit='ms')
-            if res is None:
-                lost += 1
-            else:
-                rtts.append(res)
-            time.sleep(interval)
-        if rtts:
-            telemetry_data["latency"] = sum(rtts) / len(rtts)
-            telemetry_data["jitter"] = (max(rtts) - min(rtts))
-        else:
-            telemetry_data["latency"] = 0.0
-            telemetry_data["jitter"] = 0.0
-        telemetry_data["packet_loss"] = (lost / count) * 100
-        time.sleep(2)
+# Probe the gateway, DNS servers and probe_hosts concurrently
+def probe_targets():
+    targets = []
+    seen = set()
+    for label in ("gateway", "dns1", "dns2"):
+        host = telemetry_data[label]
+        if host != "Unknown" and host not in seen:
+            seen.add(host)
+            targets.append((label, host))
+    for host in probe_hosts:
+        if host not in seen:
+            seen.add(host)
+            targets.append((host, host))
+    return targets
+
+def record_probe_reply(label, rtt, jitter):
+    # Session-wide RTT/jitter distributions follow the primary probe host
+    if probe_hosts and label == primary_probe_label:
+        telemetry_data["sketches"]["rtt"].add(rtt)
+        telemetry_data["sketches"]["jitter"].add(jitter)
+
+def collect_latency():
+    probes = latency_prober.stats()
+    telemetry_data["probes"] = probes
+    primary = next((p for p in probes.values() if probe_hosts and p["host"] == probe_hosts[0]), None)
+    if primary is None:
+        return
+    telemetry_data["latency"] = primary["mean"]
+    telemetry_data["jitter"] = primary["jitter"]
+    telemetry_data["packet_loss"] = primary["loss"]
 
-# Update upload/download speed and system resource usage
 csv_file_path = None
 json_file_path = None
+history_file_path = None
+history_writer = None
+network_watcher = None
+network_lock = threading.Lock()
+public_ip_refresh = threading.Event()
+# Fields whose change marks a session boundary
+NETWORK_FIELDS = ("ip", "subnet", "gateway", "dns1", "dns2", "ssid", "link")
+live_plot = None  # whole-session plot kept in memory, written every save_interval and at exit
 
 def init_telemetry_files():
-    global csv_file_path, json_file_path
+    global csv_file_path, json_file_path, history_file_path, history_writer, live_plot
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     ssid = telemetry_data.get('ssid', 'Unknown').replace(" ", "_")
     folder = os.path.join(base_dir, "History")  # Ganti ke base_dir
@@ -156,169 +232,246 @@ def init_telemetry_files():
     base_filename = f"{ssid}_{timestamp}"
     csv_file_path = os.path.join(folder, f"{base_filename}.csv")
     json_file_path = os.path.join(folder, f"{base_filename}.json")
-    # Create and write CSV header
-    with open(csv_file_path, "w") as f:
-        f.write("Time (s),Download (Mbps),Upload (Mbps)\n")
-    # Create initial JSON
-    with open(json_file_path, "w") as f:
-        json.dump({"history": []}, f, indent=2)
+    # Append-only journal, columnar store or tiered rollups; JSON is a snapshot written at exit
+    header = {
+        "ssid": telemetry_data.get('ssid', 'Unknown'),
+        "started": timestamp,
+    }
+    fields = list(SESSION_FIELDS)
+    if all_interfaces:
+        # Per-NIC columns after the aggregate: <nic>_download, <nic>_upload (Mbps), <nic>_errors, <nic>_drops
+        header["interfaces"] = monitored_nics
+        header["aggregate_interfaces"] = aggregate_nics
+        fields += [f"{nic}_{name}" for nic in monitored_nics for name in NIC_FIELDS]
+    history_store = open_session_store(os.path.join(folder, base_filename), history_format, header,
+                                       tiers=history_tiers, sample_interval=sample_interval, fields=fields)
+    history_file_path = history_store.path
+    live_plot = LivePlot(f"Network Speed Telemetry - {telemetry_data.get('ssid', 'Unknown')}")
+    sinks = [history_store]
+    if history_format != "tiered":
+        # The CSV log grows without bound, so the bounded tiered format goes without it
+        sinks.insert(0, CsvLog(csv_file_path))
+    # CSV and history are written by a background thread so the sampler never waits on disk
+    history_writer = BackgroundWriter(
+        sinks,
+        maxsize=write_queue_size,
+        flush_interval=flush_interval,
+        fsync=fsync_policy,
+    )
 
 def append_telemetry_files(t, d, u):
-    # Append to CSV
-    if csv_file_path:
-        try:
-            with open(csv_file_path, "a") as f:
-                f.write(f"{t:.2f},{d:.3f},{u:.3f}\n")
-        except Exception as e:
-            console.log(f"[red]Failed to append CSV:[/red] {e}")
-    # Update JSON (overwrite with full history)
-    if json_file_path:
-        try:
-            # Read existing JSON
-            with open(json_file_path, "r") as f:
-                data = json.load(f)
-            if "history" not in data:
-                data["history"] = []
-            data["history"].append([t, d, u])
-            with open(json_file_path, "w") as f:
-                json.dump(data, f, indent=2)
-        except Exception as e:
-            console.log(f"[red]Failed to update JSON:[/red] {e}")
-
-def save_telemetry_plot_from_json():
-    if not json_file_path:
+    # Queue the sample (SESSION_FIELDS order); dropped and counted if the writer falls behind
+    if history_writer:
+        row = [
+            round(t, 2), round(d, 3), round(u, 3),
+            round(telemetry_data["latency"], 2), round(telemetry_data["jitter"], 2),
+            telemetry_data["packet_loss"], telemetry_data["cpu"], telemetry_data["memory"],
+        ]
+        if all_interfaces:
+            nics = telemetry_data["nics"]
+            for nic in monitored_nics:
+                entry = nics.get(nic)
+                if entry:
+                    row += [round(entry["download"] / 1e6, 3), round(entry["upload"] / 1e6, 3), entry["errors"], entry["drops"]]
+                else:
+                    row += [0.0, 0.0, 0, 0]
+        history_writer.submit(row)
+
+def save_sketches():
+    if history_writer:
+        history_writer.submit({"sketches": {name: sk.to_dict() for name, sk in telemetry_data["sketches"].items()}})
+
+def close_telemetry_files():
+    if history_writer:
+        save_sketches()
+        history_writer.close()
+        if history_writer.last_error:
+            console.log(f"[red]Failed to write history:[/red] {history_writer.last_error}")
+
+def save_telemetry_snapshot():
+    if not history_file_path or not history_file_path.endswith(JOURNAL_EXT):
         return
     try:
-        with open(json_file_path, "r") as f:
-            data = json.load(f)
-        hist = data.get("history", [])
-        if not hist:
-            return
-        times = [t for t, _, _ in hist]
-        downloads = [d for _, d, _ in hist]
-        uploads = [u for _, _, u in hist]
-        ssid = telemetry_data.get('ssid', 'Unknown').replace(" ", "_")
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        folder = os.path.join(base_dir, "History")  # Ganti ke base_dir
-        os.makedirs(folder, exist_ok=True)
-        base_filename = f"{ssid}_{timestamp}_plot"
-        png_path = os.path.join(folder, f"{base_filename}.png")
-        plt.figure(figsize=(10, 5))
-        ax = plt.gca()
-        ax.set_facecolor("#23272e")  # dark gray background
-        plt.gcf().patch.set_facecolor("#23272e")
-        # Garis download magenta, upload hijau
-        plt.plot(times, downloads, label="Download (Mbps)", color="magenta")
-        plt.plot(times, uploads, label="Upload (Mbps)", color="lime")
-        # Grid dan teks putih
-        plt.xlabel("Time (s)", color="white")
-        plt.ylabel("Speed (Mbps)", color="white")
-        plt.title(f"Network Speed Telemetry - {ssid}", color="white")
-        plt.legend(facecolor="#23272e", edgecolor="white", labelcolor="white")
-        plt.grid(True, color="white", alpha=0.2)
-        # Set semua axis label dan tick ke putih
-        ax.tick_params(axis='x', colors='white')
-        ax.tick_params(axis='y', colors='white')
-        ax.spines['bottom'].set_color('white')
-        ax.spines['top'].set_color('white')
-        ax.spines['left'].set_color('white')
-        ax.spines['right'].set_color('white')
-        plt.tight_layout()
-        plt.savefig(png_path, facecolor=plt.gcf().get_facecolor())
-        plt.close()
-        console.print(f"[bold green]Saved plot to {png_path}[/bold green]")
+        write_snapshot(history_file_path, json_file_path)
+    except Exception as e:
+        console.log(f"[red]Failed to update JSON:[/red] {e}")
+
+def save_telemetry_plot():
+    if not live_plot or not json_file_path:
+        return
+    png_path = os.path.splitext(json_file_path)[0] + ".png"
+    try:
+        if live_plot.snapshot(png_path):
+            return png_path
     except Exception as e:
         console.log(f"[red]Failed to save plot:[/red] {e}")
 
-def update_speed():
-    global initial_sent, initial_recv
-    if interface:
-        counters = psutil.net_io_counters(pernic=True).get(interface)
-    else:
-        counters = psutil.net_io_counters()
-    initial_sent = counters.bytes_sent
-    initial_recv = counters.bytes_recv
-    old_sent = counters.bytes_sent
-    old_recv = counters.bytes_recv
+# Periodic sketch and plot saves; the JSON snapshot rewrites the whole
+# journal, so it is only repeated here with --json-snapshot
+def save_periodic():
     while True:
-        time.sleep(1)
-        if interface:
-            counters = psutil.net_io_counters(pernic=True).get(interface)
-        else:
-            counters = psutil.net_io_counters()
-        new_sent = counters.bytes_sent
-        new_recv = counters.bytes_recv
-        upload_bps = (new_sent - old_sent) * 8
-        download_bps = (new_recv - old_recv) * 8
-        telemetry_data["upload"] = upload_bps
-        telemetry_data["download"] = download_bps
-        telemetry_data["top_upload"] = max(telemetry_data["top_upload"], upload_bps)
-        telemetry_data["top_download"] = max(telemetry_data["top_download"], download_bps)
-        telemetry_data["sent"] = (new_sent - initial_sent) / (1024 ** 2)
-        telemetry_data["recv"] = (new_recv - initial_recv) / (1024 ** 2)
-        t = time.time() - start_time
-        telemetry_data["history"].append((t, download_bps / 1e6, upload_bps / 1e6))
-        if len(telemetry_data["history"]) > 3600:
-            telemetry_data["history"].pop(0)
-        # Append to files
-        append_telemetry_files(t, download_bps / 1e6, upload_bps / 1e6)
-        old_sent, old_recv = new_sent, new_recv
-        # update CPU and memory
-        telemetry_data["cpu"] = psutil.cpu_percent(interval=None)
-        telemetry_data["memory"] = psutil.virtual_memory().percent
-        # update interface stats
-        nic_stats = psutil.net_io_counters(pernic=True).get(interface) if interface else None
-        if nic_stats:
-            telemetry_data["errors_in"] = nic_stats.errin
-            telemetry_data["errors_out"] = nic_stats.errout
-            telemetry_data["drop_in"] = nic_stats.dropin
-            telemetry_data["drop_out"] = nic_stats.dropout
-        # update connection counts
+        time.sleep(save_interval)
+        save_sketches()
+        if json_snapshot:
+            save_telemetry_snapshot()
+        save_telemetry_plot()
+
+# One pernic read per tick serves the aggregate, the per-NIC rates and the error counters
+def read_counters():
+    global nic_counters, total_counters
+    nic_counters = psutil.net_io_counters(pernic=True)
+    if all_interfaces:
+        total_counters = sum_counters([nic_counters[nic] for nic in aggregate_nics if nic in nic_counters])
+    elif interface:
+        total_counters = nic_counters.get(interface)
+    else:
+        total_counters = psutil.net_io_counters()
+    return total_counters
+
+def sum_counters(counters):
+    if not counters:
+        return None
+    return type(counters[0])(*map(sum, zip(*counters)))
+
+def init_counters():
+    global initial_sent, initial_recv, old_sent, old_recv, old_read, old_nic_counters
+    counters = read_counters()
+    old_nic_counters = nic_counters
+    initial_sent = old_sent = counters.bytes_sent
+    initial_recv = old_recv = counters.bytes_recv
+    old_read = time.monotonic()
+
+# Interface throughput, sampled at sample_interval
+def collect_counters():
+    global old_sent, old_recv, old_read
+    counters = read_counters()
+    startup.mark_once("first sample")
+    now = time.monotonic()
+    # Rates use the measured time between reads, not the nominal interval
+    elapsed = now - old_read
+    old_read = now
+    new_sent = counters.bytes_sent
+    new_recv = counters.bytes_recv
+    upload_bps = max(0, new_sent - old_sent) * 8 / elapsed
+    download_bps = max(0, new_recv - old_recv) * 8 / elapsed
+    telemetry_data["upload"] = upload_bps
+    telemetry_data["download"] = download_bps
+    telemetry_data["top_upload"] = max(telemetry_data["top_upload"], upload_bps)
+    telemetry_data["top_download"] = max(telemetry_data["top_download"], download_bps)
+    telemetry_data["sketches"]["download"].add(download_bps / 1e6)
+    telemetry_data["sketches"]["upload"].add(upload_bps / 1e6)
+    telemetry_data["sent"] = (new_sent - initial_sent) / (1024 ** 2)
+    telemetry_data["recv"] = (new_recv - initial_recv) / (1024 ** 2)
+    t = now - start_monotonic
+    if all_interfaces:
+        update_nic_rates(elapsed)
+    telemetry_data["history"].append(t, download_bps / 1e6, upload_bps / 1e6)
+    # Append to files
+    append_telemetry_files(t, download_bps / 1e6, upload_bps / 1e6)
+    if live_plot:
+        live_plot.append(t, download_bps / 1e6, upload_bps / 1e6)
+    old_sent, old_recv = new_sent, new_recv
+
+# Per-NIC rates and error/drop deltas from the same read as the aggregate
+def update_nic_rates(elapsed):
+    global old_nic_counters
+    nics = {}
+    for nic in monitored_nics:
+        new = nic_counters.get(nic)
+        if new is None:
+            nics[nic] = None
+            continue
+        old = old_nic_counters.get(nic, new)
+        nics[nic] = {
+            "download": max(0, new.bytes_recv - old.bytes_recv) * 8 / elapsed,
+            "upload": max(0, new.bytes_sent - old.bytes_sent) * 8 / elapsed,
+            "errors": max(0, new.errin + new.errout - old.errin - old.errout),
+            "drops": max(0, new.dropin + new.dropout - old.dropin - old.dropout),
+            "counters": new,
+        }
+    old_nic_counters = nic_counters
+    telemetry_data["nics"] = nics
+
+# CPU, memory and interface error counters
+def collect_system():
+    telemetry_data["cpu"] = psutil.cpu_percent(interval=None)
+    telemetry_data["memory"] = psutil.virtual_memory().percent
+    # Taken from the counters collector's last read instead of reading again
+    nic_stats = total_counters
+    if nic_stats:
+        telemetry_data["errors_in"] = nic_stats.errin
+        telemetry_data["errors_out"] = nic_stats.errout
+        telemetry_data["drop_in"] = nic_stats.dropin
+        telemetry_data["drop_out"] = nic_stats.dropout
+
+def collect_connections():
+    if is_linux():
+        # Counted from the kernel directly; psutil would resolve a pid per socket
+        stats = connection_stats()
+        telemetry_data["active_tcp"] = stats["tcp"]
+        telemetry_data["active_udp"] = stats["udp"]
+        telemetry_data["tcp_states"] = stats["tcp_states"]
+    else:
         telemetry_data["active_tcp"] = len(psutil.net_connections(kind="tcp"))
         telemetry_data["active_udp"] = len(psutil.net_connections(kind="udp"))
-        # per-process bandwidth
-        pb = []
-        for proc in psutil.process_iter(attrs=['pid','name']):
-            try:
-                io = proc.io_counters()
-                # approximate by dividing total bytes by uptime
-                uptime = time.time() - proc.create_time()
-                up_mbps = (io.bytes_sent * 8 / uptime) / 1e6 if uptime>0 else 0
-                down_mbps = (io.bytes_recv * 8 / uptime) / 1e6 if uptime > 0 else 0
-                if up_mbps>0.1 or down_mbps>0.1:
-                    pb.append((proc.pid, proc.info['name'], up_mbps, down_mbps))
-            except:
-                continue
-        pb.sort(key=lambda x: (x[2]+x[3]), reverse=True)
-        telemetry_data["process_bandwidth"] = pb[:5]
+
+# per-process bandwidth from per-socket byte deltas between scans
+def collect_processes():
+    telemetry_data["process_bandwidth"] = process_bandwidth.sample(top=5, min_mbps=0.01)
+    # Socket owner scan time covers the process table refresh as well
+    telemetry_data["process_cache"] = {**process_bandwidth.processes.stats, **process_bandwidth.owners.stats}
+
+# Each metric group runs on its own thread so slow scans never delay the counters
+def start_collectors(counters_only=False):
+    global process_bandwidth, latency_prober, primary_probe_label
+    init_counters()
+    telemetry_data["sample_interval"] = sample_interval
+    scheduler = CollectorScheduler(telemetry_data["collectors"])
+    scheduler.add("counters", sample_interval, collect_counters)
+    if counters_only:
+        scheduler.start()
+        return
+    scheduler.add("system", system_interval, collect_system)
+    # Slow cadences run once right away so the UI does not show zeros until then
+    scheduler.add("connections", connections_interval, collect_connections, prime=True)
+    targets = probe_targets()
+    primary_probe_label = next((label for label, host in targets if probe_hosts and host == probe_hosts[0]), None)
+    latency_prober = LatencyProber(targets, rate=probe_rate, window=probe_window, mode=probe_mode,
+                                   on_reply=record_probe_reply)
+    latency_prober.start()
+    scheduler.add("latency", 1.0, collect_latency)
+    if is_linux():
+        # Full fd rescans at most every sixth scan
+        process_bandwidth = ProcessBandwidth(rescan_interval=processes_interval * 6)
+        # The primed run records the byte baseline, so the first scheduled scan has rates
+        scheduler.add("processes", processes_interval, collect_processes, prime=True)
+    scheduler.start()
 
 # One-time upload test
 def run_one_time_upload_test(duration=10):
     telemetry_data["upload_test_running"] = True
-    url = "https://httpbin.org/post"
-    dummy_data = b"x" * (1024 * 512)
-    end_time = time.time() + duration
-    session = requests.Session()
-    bytes_sent_total = 0
-    bytes_sent_since_last = 0
-    last_update = time.time()
-    while time.time() < end_time:
-        try:
-            session.post(url, data=dummy_data, timeout=10)
-            bytes_sent_total += len(dummy_data)
-            bytes_sent_since_last += len(dummy_data)
-        except:
-            time.sleep(1)
-        now = time.time()
-        if now - last_update >= 1.0:
-            telemetry_data["upload_test_speed"] = bytes_sent_since_last * 8
-            bytes_sent_since_last = 0
-            last_update = now
-    telemetry_data["upload_test_speed"] = (bytes_sent_total * 8) / duration
+    engine = create_upload_engine()
+    engine.start()
+    end_time = time.monotonic() + duration
+    ticker = Ticker(1.0)
+    while time.monotonic() < end_time:
+        ticker.wait()
+        stats = engine.sample()
+        telemetry_data["upload_test_speed"] = stats["aggregate_bps"]
+        telemetry_data["upload_test_streams"] = stats["streams"]
+        telemetry_data["upload_test_bytes"] = stats["bytes"]
+        telemetry_data["upload_test_errors"] = stats["errors"]
+    engine.stop()
+    engine.join(5)
+    stats = engine.sample()
+    telemetry_data["upload_test_bytes"] = stats["bytes"]
+    telemetry_data["upload_test_errors"] = stats["errors"]
+    telemetry_data["upload_test_speed"] = (stats["bytes"] * 8) / duration
     telemetry_data["upload_test_running"] = False
 
 # Speedtest integration every 10 minutes
 def run_speedtest_periodic():
+    speedtest = startup.lazy_import("speedtest")
     while True:
         try:
             st = speedtest.Speedtest()
@@ -332,53 +485,11 @@ def run_speedtest_periodic():
             telemetry_data["speedtest_upload"] = 0
         time.sleep(600)
 
-# Get WiFi info (RSSI, channel, freq)
+# Get WiFi info (RSSI, channel, freq) and link state
 def update_wifi_info():
     while True:
-        ssid = "Unknown"
-        manufacturer = "Unknown"
-        rssi = "Unknown"
-        channel = "Unknown"
-        frequency = "Unknown"
-        try:
-            if os.name == "nt":
-                out = subprocess.check_output("netsh wlan show interfaces", shell=True).decode(errors="ignore")
-                for line in out.splitlines():
-                    if "SSID" in line and "BSSID" not in line:
-                        ssid = line.split(":",1)[-1].strip()
-                    if "Signal" in line:
-                        rssi = line.split(":",1)[-1].strip()
-                    if "Radio type" in line:
-                        manufacturer = line.split(":",1)[-1].strip()
-            else:
-                try:
-                    out = subprocess.check_output("iwgetid -r", shell=True).decode().strip()
-                    if out:
-                        ssid = out
-                except:
-                    pass
-                try:
-                    out = subprocess.check_output("iwconfig 2>/dev/null", shell=True).decode()
-                    for line in out.splitlines():
-                        if "Channel" in line:
-                            parts = line.split()
-                            for p in parts:
-                                if p.startswith("Channel"):
-                                    channel = p.split(":")[-1]
-                                if "Frequency" in p:
-                                    frequency = p.split(":")[-1]
-                        if "Signal level" in line:
-                            rssi = line.split("Signal level=")[-1].split()[0]
-                except:
-                    pass
-        except:
-            pass
-        telemetry_data["ssid"] = ssid
-        telemetry_data["manufacturer"] = manufacturer
-        telemetry_data["rssi"] = rssi
-        telemetry_data["channel"] = channel
-        telemetry_data["frequency"] = frequency
         time.sleep(5)
+        refresh_network_info({"wifi"})
 
 def update_wifi_info_once():
     ssid = "Unknown"
@@ -396,27 +507,16 @@ def update_wifi_info_once():
                     rssi = line.split(":",1)[-1].strip()
                 if "Radio type" in line:
                     manufacturer = line.split(":",1)[-1].strip()
-        else:
-            try:
-                out = subprocess.check_output("iwgetid -r", shell=True).decode().strip()
-                if out:
-                    ssid = out
-            except:
-                pass
-            try:
-                out = subprocess.check_output("iwconfig 2>/dev/null", shell=True).decode()
-                for line in out.splitlines():
-                    if "Channel" in line:
-                        parts = line.split()
-                        for p in parts:
-                            if p.startswith("Channel"):
-                                channel = p.split(":")[-1]
-                            if "Frequency" in p:
-                                frequency = p.split(":")[-1]
-                    if "Signal level" in line:
-                        rssi = line.split("Signal level=")[-1].split()[0]
-            except:
-                pass
+        elif is_linux():
+            # nl80211 and /proc/net/wireless; no iwgetid/iwconfig processes
+            wifi = wifi_info(interface)
+            if wifi:
+                ssid = wifi["ssid"] or ssid
+                if wifi["frequency"]:
+                    frequency = f"{wifi['frequency']} MHz"
+                    channel = str(freq_to_channel(wifi["frequency"]) or "Unknown")
+                if wifi["signal"] is not None:
+                    rssi = f"{wifi['signal']:g} dBm"
     except:
         pass
     telemetry_data["ssid"] = ssid
@@ -424,24 +524,77 @@ def update_wifi_info_once():
     telemetry_data["rssi"] = rssi
     telemetry_data["channel"] = channel
     telemetry_data["frequency"] = frequency
+    telemetry_data["link"] = describe_link()
+
+def describe_link():
+    if interface is None:
+        return "Unknown"
+    if is_linux():
+        state = link_state(interface)
+        parts = [state["operstate"]]
+        if state["operstate"] == "up" and not state["carrier"]:
+            parts.append("no carrier")
+        speed, mtu = state["speed"], state["mtu"]
+        wireless = state["wireless"]
+    else:
+        stat = psutil.net_if_stats().get(interface)
+        if stat is None:
+            return "Unknown"
+        parts = ["up" if stat.isup else "down"]
+        speed, mtu, wireless = stat.speed, stat.mtu, False
+    if speed:
+        parts.append(f"{speed} Mb/s")
+    if mtu:
+        parts.append(f"MTU {mtu}")
+    if wireless:
+        parts.append("wireless")
+    return ", ".join(parts)
 
 # Get network interface info (ip, subnet, gateway, dns)
-def get_network_info():
+def get_network_info(name=None):
     global interface
     addrs = psutil.net_if_addrs()
+    if name:
+        if name not in addrs:
+            raise SystemExit(f"Unknown interface: {name}")
+        interface = name
+    else:
+        from rich.prompt import Prompt
+        stats = psutil.net_if_stats()
+        choices = [name for name, stat in stats.items() if stat.isup and name != "lo"]
+        if not choices:
+            choices = list(addrs.keys())
+        console.print("Available interfaces:")
+        for i, name in enumerate(choices, 1):
+            console.print(f"  [green]{i}[/green]. {name}")
+        choice = Prompt.ask("Select interface number to monitor", choices=[str(i) for i in range(1, len(choices)+1)], default="1")
+        interface = choices[int(choice)-1]
+    telemetry_data.update(read_network_info())
+
+# Monitor every interface that is up; the primary one (given, or the one
+# holding the default route) supplies IP, gateway and WiFi details
+def select_all_interfaces(primary=None):
+    global all_interfaces, monitored_nics, aggregate_nics, nic_masters
     stats = psutil.net_if_stats()
-    choices = [name for name, stat in stats.items() if stat.isup and name != "lo"]
-    if not choices:
-        choices = list(addrs.keys())
-    console.print("Available interfaces:")
-    for i, name in enumerate(choices, 1):
-        console.print(f"  [green]{i}[/green]. {name}")
-    choice = Prompt.ask("Select interface number to monitor", choices=[str(i) for i in range(1, len(choices)+1)], default="1")
-    interface = choices[int(choice)-1]
-    for snic in addrs.get(interface, []):
+    monitored_nics = [name for name, stat in stats.items()
+                      if stat.isup and name != "lo" and "loopback" not in getattr(stat, "flags", "")]
+    if not monitored_nics:
+        monitored_nics = [name for name in stats if name != "lo"] or list(stats)
+    nic_masters = {nic: interface_master(nic) for nic in monitored_nics} if is_linux() else {}
+    # Bond, bridge and team members carry the same bytes as their master
+    aggregate_nics = [nic for nic in monitored_nics if nic_masters.get(nic) not in monitored_nics]
+    all_interfaces = True
+    if primary is None and is_linux():
+        primary = default_route_interface()
+    get_network_info(primary if primary in stats else monitored_nics[0])
+
+# Address, gateway and DNS of the monitored interface
+def read_network_info():
+    info = {"ip": "0.0.0.0", "subnet": "Unknown", "gateway": "Unknown"}
+    for snic in psutil.net_if_addrs().get(interface, []):
         if snic.family == socket.AF_INET:
-            telemetry_data["ip"] = snic.address
-            telemetry_data["subnet"] = snic.netmask
+            info["ip"] = snic.address
+            info["subnet"] = snic.netmask
             break
     try:
         if os.name == "nt":
@@ -453,17 +606,11 @@ def get_network_info():
                     if len(parts) >= 3:
                         gw = parts[2]
                         break
-            telemetry_data["gateway"] = gw
-        else:
-            out = subprocess.check_output("ip route", shell=True).decode(errors="ignore")
-            gw = "Unknown"
-            for line in out.splitlines():
-                if line.startswith("default via"):
-                    gw = line.split()[2]
-                    break
-            telemetry_data["gateway"] = gw
+            info["gateway"] = gw
+        elif is_linux():
+            info["gateway"] = default_gateway(interface) or "Unknown"
     except:
-        telemetry_data["gateway"] = "Unknown"
+        info["gateway"] = "Unknown"
     try:
         dns1 = dns2 = "Unknown"
         dns_ipv4 = []
@@ -516,14 +663,56 @@ def get_network_info():
                 dns1 = dns_ipv6[0]
                 if len(dns_ipv6)>1:
                     dns2 = dns_ipv6[1]
-        telemetry_data["dns1"] = dns1
-        telemetry_data["dns2"] = dns2
+        info["dns1"] = dns1
+        info["dns2"] = dns2
     except:
-        telemetry_data["dns1"] = "Unknown"
-        telemetry_data["dns2"] = "Unknown"
+        info["dns1"] = "Unknown"
+        info["dns2"] = "Unknown"
+    return info
+
+# Re-read network state after a change event (or the WiFi poll) and record
+# a session boundary in the history when any of NETWORK_FIELDS changed
+def refresh_network_info(kinds):
+    with network_lock:
+        before = {key: telemetry_data[key] for key in NETWORK_FIELDS}
+        if kinds - {"wifi"}:
+            for key, value in read_network_info().items():
+                if telemetry_data[key] != value:
+                    telemetry_data[key] = value
+        update_wifi_info_once()
+        changed = {key: [before[key], telemetry_data[key]] for key in NETWORK_FIELDS
+                   if telemetry_data[key] != before[key]}
+        if not changed:
+            return
+        event = {
+            "t": round(time.monotonic() - start_monotonic, 3),
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "kinds": sorted(kinds),
+            "changed": changed,
+        }
+        telemetry_data["network_changes"].append(event)
+        if history_writer:
+            history_writer.submit({"network_changes": list(telemetry_data["network_changes"])})
+    if latency_prober and changed.keys() & {"gateway", "dns1", "dns2"}:
+        latency_prober.set_targets(probe_targets())
+    if changed.keys() & {"ip", "gateway"}:
+        public_ip_refresh.set()
+
+def start_network_watcher():
+    global network_watcher
+    if not is_linux():
+        return
+    watcher = NetworkWatcher(refresh_network_info, None if all_interfaces else interface)
+    try:
+        watcher.start()
+    except OSError as e:
+        console.log(f"[yellow]Network change events unavailable, polling WiFi only:[/yellow] {e}")
+        return
+    network_watcher = watcher
 
 # Display UI with Rich
 def telemetry_ui():
+    from rich.live import Live
     with Live(refresh_per_second=1) as live:
         while True:
             tbl = Table(title="📶 Net Benchmark Monitor", expand=True, box=box.SIMPLE_HEAVY)
@@ -543,6 +732,11 @@ def telemetry_ui():
             tbl.add_row("Signal (RSSI)", telemetry_data['rssi'])
             tbl.add_row("Channel", telemetry_data['channel'])
             tbl.add_row("Frequency", telemetry_data['frequency'])
+            tbl.add_row("Link", telemetry_data['link'])
+            changes = telemetry_data['network_changes']
+            if changes:
+                last = changes[-1]
+                tbl.add_row("Network Changes", f"{len(changes)} (last {last['time'][11:]}: {', '.join(last['changed'])})")
             # Speed Info
             dl_mbps = telemetry_data['download']/1e6
             ul_mbps = telemetry_data['upload']/1e6
@@ -562,17 +756,46 @@ def telemetry_ui():
                 ul_style = "green"
             download_str = Text(f"{format_speed(telemetry_data['download'])} / {format_speed(telemetry_data['top_download'])}", style=dl_style)
             if telemetry_data["upload_test_running"]:
-                upload_str = Text(f"Testing... {format_speed(telemetry_data['upload_test_speed'])}", style=ul_style)
+                upload_str = Text(f"Testing... {format_speed(telemetry_data['upload_test_speed'])} over {upload_connections} conns", style=ul_style)
             else:
                 upload_str = Text(f"{format_speed(telemetry_data['upload'])} / {format_speed(telemetry_data['top_upload'])}", style=ul_style)
             tbl.add_row("Download Speed", download_str)
             tbl.add_row("Upload Speed", upload_str)
+            if all_interfaces:
+                for nic, entry in telemetry_data["nics"].items():
+                    label = f"  {nic}" + (f" ({nic_masters[nic]})" if nic_masters.get(nic) else "")
+                    if entry is None:
+                        tbl.add_row(label, "gone")
+                        continue
+                    c = entry["counters"]
+                    tbl.add_row(label, f"↓ {format_speed(entry['download'])}  ↑ {format_speed(entry['upload'])}  "
+                                       f"err {c.errin}/{c.errout}  drop {c.dropin}/{c.dropout}")
+            tbl.add_row("Upload Test", f"{format_speed(telemetry_data['upload_test_speed'])}, {telemetry_data['upload_test_bytes'] / (1024 ** 2):.1f} MB acked, {telemetry_data['upload_test_errors']} errors")
             tbl.add_row("Speedtest DL", format_speed(telemetry_data['speedtest_download']))
             tbl.add_row("Speedtest UL", format_speed(telemetry_data['speedtest_upload']))
+            traffic = telemetry_data['traffic']
+            tbl.add_row("Stress Download", f"{format_speed(traffic['aggregate_bps'])} over {len(traffic['streams'])} streams ({traffic['errors']} errors)")
+            if traffic['streams']:
+                tbl.add_row("Per Stream", "  ".join(f"#{i + 1} {format_speed(bps)}" for i, bps in enumerate(traffic['streams'])))
+                tbl.add_row("Engine CPU", f"{traffic['cpu_pct']:.1f} % ({traffic['cpu_per_gbps']:.1f} % per Gbps, {traffic['bytes_per_cpu_pct'] / 1e6:.1f} MB/s per CPU %)")
             # Latency Stats
             tbl.add_row("Latency", f"{telemetry_data['latency']:.2f} ms")
             tbl.add_row("Jitter", f"{telemetry_data['jitter']:.2f} ms")
             tbl.add_row("Packet Loss", f"{telemetry_data['packet_loss']:.2f} %")
+            sketch_lines = []
+            for name, unit in (("download", "Mbps"), ("upload", "Mbps"), ("rtt", "ms"), ("jitter", "ms")):
+                sk = telemetry_data["sketches"][name]
+                if sk.count:
+                    sketch_lines.append(f"{name}: {sk.quantile(0.5):.2f}/{sk.quantile(0.95):.2f}/{sk.quantile(0.99):.2f} {unit}")
+            tbl.add_row("Session p50/p95/p99", "\n".join(sketch_lines) if sketch_lines else "N/A")
+            probe_lines = []
+            for label, p in telemetry_data['probes'].items():
+                if p["error"] and not p["received"]:
+                    probe_lines.append(f"{label}: {p['error']}")
+                else:
+                    probe_lines.append(f"{label}: {p['p50']:.1f}/{p['p95']:.1f}/{p['p99']:.1f} ms, jit {p['jitter']:.2f}, loss {p['loss']:.0f}%")
+            kind = f" ({latency_prober.kind})" if latency_prober and latency_prober.kind else ""
+            tbl.add_row(f"p50/p95/p99{kind}", "\n".join(probe_lines) if probe_lines else "N/A")
             # Resource Usage
             tbl.add_row("CPU Usage", f"{telemetry_data['cpu']:.1f} %")
             tbl.add_row("Memory Usage", f"{telemetry_data['memory']:.1f} %")
@@ -582,17 +805,38 @@ def telemetry_ui():
             # Connection Stats
             tbl.add_row("Active TCP Conns", str(telemetry_data['active_tcp']))
             tbl.add_row("Active UDP Conns", str(telemetry_data['active_udp']))
+            if telemetry_data['tcp_states']:
+                states = sorted(telemetry_data['tcp_states'].items(), key=lambda x: x[1], reverse=True)
+                tbl.add_row("TCP States", "  ".join(f"{name} {count}" for name, count in states))
             tbl.add_row("Errors In/Out", f"{telemetry_data['errors_in']}/{telemetry_data['errors_out']}")
             tbl.add_row("Dropped In/Out", f"{telemetry_data['drop_in']}/{telemetry_data['drop_out']}")
+            collectors = telemetry_data["collectors"]
+            if "counters" in collectors:
+                sampler = collectors["counters"]
+                tbl.add_row("Sampler", f"{telemetry_data['sample_interval'] * 1000:.0f} ms, late {sampler['lateness'] * 1000:.2f} ms, missed {sampler['missed']}")
+            ages = []
+            for name, st in collectors.items():
+                age = time.time() - st["updated"] if st["updated"] else float("inf")
+                style = "red" if age > 3 * st["interval"] else "green"
+                age_str = f"{age:.1f}s" if st["updated"] else "never"
+                ages.append(f"[{style}]{name} {age_str}[/{style}]")
+            tbl.add_row("Last Updated", Text.from_markup("  ".join(ages)) if ages else "N/A")
+            if history_writer:
+                ws = history_writer.stats()
+                tbl.add_row("History Writer", f"queue {ws['depth']}/{ws['capacity']} (max {ws['max_depth']}), written {ws['written']}, dropped {ws['dropped']}, errors {ws['errors']}")
             # Per-process bandwidth
             pb_lines = []
             for pid, name, up_m, down_m in telemetry_data['process_bandwidth']:
                 pb_lines.append(f"{pid}:{name} ↑{up_m:.2f}Mbps ↓{down_m:.2f}Mbps")
             tbl.add_row("Top Processes", "\n".join(pb_lines) if pb_lines else "N/A")
+            pc = telemetry_data['process_cache']
+            if pc:
+                tbl.add_row("Process Cache", f"{pc['pids']} pids, {pc['hits']} cached, {pc['new']} new, {pc['evicted']} gone, "
+                                              f"{pc['fd_scans']} fd scans, {pc['unowned']} unowned, scan {pc['scan_ms']:.1f} ms")
             # ASCII Sparklines for last history_limit points
-            hist = telemetry_data['history'][-history_limit:]
-            dl_vals = [d for _, d, _ in hist]
-            ul_vals = [u for _, _, u in hist]
+            hist = telemetry_data['history']
+            dl_vals = hist.last("download", history_limit)
+            ul_vals = hist.last("upload", history_limit)
             if dl_vals:
                 # dl_spark = Sparkline(dl_vals, max_width=history_limit)  # DIHAPUS
                 dl_spark = ascii_sparkline(dl_vals, width=history_limit)
@@ -611,46 +855,370 @@ def telemetry_ui():
 # Continuous traffic download from Big Buck Bunny 4K
 def run_continuous_traffic():
     """
-    Melakukan download terus-menerus dari Big Buck Bunny 4K untuk traffic test.
+    Melakukan download terus-menerus dari Big Buck Bunny 4K untuk traffic test,
+    dengan beberapa stream paralel (lihat --streams, --url, --target-rate).
     """
-    url = "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/BigBuckBunny.mp4"
-    session = requests.Session()
+    engine = create_traffic_engine(traffic_urls)
+    engine.start()
+    ticker = Ticker(1.0)
     while True:
-        try:
-            with session.get(url, stream=True, timeout=30) as r:
-                for chunk in r.iter_content(chunk_size=1024*1024):
-                    if chunk is None:
-                        break
-                    # Tidak perlu menyimpan data, hanya untuk traffic
-        except Exception as e:
-            time.sleep(2)  # Retry delay jika error
+        ticker.wait()
+        telemetry_data["traffic"] = engine.sample()
+
+def create_traffic_engine(urls):
+    if traffic_engine == "threads":
+        return DownloadEngine(urls, streams=traffic_streams, target_bps=traffic_target_bps)
+    return AsyncTrafficEngine(urls, streams=traffic_streams, target_bps=traffic_target_bps,
+                              recv_mode=traffic_recv_mode, rcvbuf=traffic_rcvbuf, sndbuf=traffic_sndbuf)
+
+def create_upload_engine():
+    url = upload_url
+    if url == "local":
+        url = f"{local_server_url()}/upload"
+    return AsyncTrafficEngine([url], streams=upload_connections, mode="upload")
+
+def loopback_interface():
+    for name, snics in psutil.net_if_addrs().items():
+        if any(snic.family == socket.AF_INET and snic.address.startswith("127.") for snic in snics):
+            return name
+    return None
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# Latency under load: idle baseline, then each load pattern, probing throughout
+BUFFERBLOAT_PHASES = [
+    ("idle", False, False),
+    ("download", True, False),
+    ("upload", False, True),
+    ("bidirectional", True, True),
+]
+# (max added p95 latency in ms, grade)
+BUFFERBLOAT_GRADES = [(5, "A+"), (30, "A"), (60, "B"), (200, "C"), (400, "D")]
+
+def bufferbloat_grade(added_ms):
+    for limit, grade in BUFFERBLOAT_GRADES:
+        if added_ms < limit:
+            return grade
+    return "F"
+
+def run_bufferbloat_test(phase_duration):
+    targets = probe_targets()
+    phases = []
+    for name, download, upload in BUFFERBLOAT_PHASES:
+        console.print(f"[bold cyan]Bufferbloat: {name} phase ({phase_duration:.0f}s)...[/bold cyan]")
+        engines = []
+        if download:
+            engines.append(("download", create_traffic_engine(traffic_urls)))
+        if upload:
+            engines.append(("upload", create_upload_engine()))
+        for _, engine in engines:
+            engine.start()
+        # Let the load reach steady state before judging the queue
+        if engines:
+            time.sleep(min(2.0, phase_duration / 4))
+            for _, engine in engines:
+                engine.sample()
+        prober = LatencyProber(targets, rate=bufferbloat_rate, window=int(bufferbloat_rate * phase_duration) + 1,
+                               mode=probe_mode)
+        began = time.monotonic()
+        prober.start()
+        time.sleep(phase_duration)
+        prober.stop()
+        elapsed = time.monotonic() - began
+        phase = {"phase": name, "download_bps": 0.0, "upload_bps": 0.0, "errors": 0}
+        for kind, engine in engines:
+            stats = engine.sample()
+            phase[f"{kind}_bps"] = stats["aggregate_bps"]
+            phase["errors"] += stats["errors"]
+            engine.stop()
+        prober.join(2)
+        phase["duration"] = elapsed
+        phase["targets"] = prober.stats()
+        phases.append(phase)
+    idle = phases[0]["targets"]
+    for phase in phases:
+        for label, p in phase["targets"].items():
+            base = idle.get(label, p)
+            for pct in ("p50", "p95", "p99"):
+                p[f"added_{pct}"] = max(0.0, p[pct] - base[pct])
+    primary = next((label for label, host in targets if probe_hosts and host == probe_hosts[0]), None)
+    worst = max((ph["targets"][primary]["added_p95"] for ph in phases if primary in ph["targets"]), default=0.0)
+    result = {
+        "ssid": telemetry_data.get("ssid", "Unknown"),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "phase_duration": phase_duration,
+        "probe_rate": bufferbloat_rate,
+        "primary": primary,
+        "grade": bufferbloat_grade(worst) if primary else "N/A",
+        "phases": phases,
+    }
+    tbl = Table(title=f"🚦 Latency Under Load (grade {result['grade']})", box=box.SIMPLE_HEAVY)
+    for col in ("Phase", "Target", "Mbps ↓/↑", "p50/p95/p99 ms", "Added p95", "Loss"):
+        tbl.add_column(col)
+    for phase in phases:
+        load = f"{phase['download_bps'] / 1e6:.0f}/{phase['upload_bps'] / 1e6:.0f}"
+        for label, p in phase["targets"].items():
+            tbl.add_row(phase["phase"], label, load,
+                        f"{p['p50']:.1f}/{p['p95']:.1f}/{p['p99']:.1f}",
+                        f"+{p['added_p95']:.1f} ms", f"{p['loss']:.0f} %")
+    console.print(tbl)
+    out_path = os.path.splitext(json_file_path)[0] + "_bufferbloat.json"
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=2)
+    console.print(f"[bold green]Saved latency-under-load results to {out_path}[/bold green]")
+    return result
+
+# Loopback calibration: same traffic engine and counter sampler, no network needed
+def run_calibration(duration):
+    global interface
+    interface = loopback_interface()
+    if interface is None:
+        console.print("[red]No loopback interface found.[/red]")
+        return
+    console.print(f"[bold cyan]Calibrating on {interface} for {duration:.0f}s "
+                  f"({traffic_engine}, {traffic_streams} streams, {sample_interval * 1000:.0f} ms sampling)...[/bold cyan]")
+    engine = create_traffic_engine([f"{local_server_url()}/download"])
+    engine.start()
+    time.sleep(1.0)  # warm-up: connections established, windows opened
+    init_counters()
+    engine.sample()
+    process = psutil.Process()
+    process.cpu_percent(None)
+    psutil.cpu_percent(None)
+    ticker = Ticker(sample_interval)
+    lateness = []
+    intervals = []
+    rates = []
+    last_wake = time.monotonic()
+    end_time = last_wake + duration
+    while time.monotonic() < end_time:
+        wake = ticker.wait()
+        lateness.append(ticker.last_lateness * 1000)
+        intervals.append((wake - last_wake) * 1000)
+        last_wake = wake
+        collect_counters()
+        # Loopback counts every byte once as sent and once as received
+        rates.append(telemetry_data["download"])
+    stats = engine.sample()
+    process_cpu = process.cpu_percent(None)
+    system_cpu = psutil.cpu_percent(None)
+    engine.stop()
+    sampled_avg = sum(rates) / len(rates) if rates else 0.0
+    mean_interval = sum(intervals) / len(intervals) if intervals else 0.0
+    interval_jitter = (sum((i - mean_interval) ** 2 for i in intervals) / len(intervals)) ** 0.5 if intervals else 0.0
+    result = {
+        "interface": interface,
+        "engine": traffic_engine,
+        "recv_mode": traffic_recv_mode,
+        "streams": traffic_streams,
+        "duration_s": duration,
+        "sample_interval_ms": sample_interval * 1000,
+        "engine_mbps": stats["aggregate_bps"] / 1e6,
+        "sampled_avg_mbps": sampled_avg / 1e6,
+        "sampled_peak_mbps": max(rates) / 1e6 if rates else 0.0,
+        "sampler_vs_engine_pct": (sampled_avg / stats["aggregate_bps"] * 100) if stats["aggregate_bps"] else 0.0,
+        "engine_cpu_pct": stats["cpu_pct"],
+        "engine_cpu_per_gbps": stats["cpu_per_gbps"],
+        "process_cpu_pct": process_cpu,
+        "system_cpu_pct": system_cpu,
+        "lateness_mean_ms": sum(lateness) / len(lateness) if lateness else 0.0,
+        "lateness_p99_ms": percentile(lateness, 99),
+        "lateness_max_ms": max(lateness) if lateness else 0.0,
+        "interval_jitter_ms": interval_jitter,
+        "missed_ticks": ticker.missed,
+        "errors": stats["errors"],
+    }
+    tbl = Table(title="🧪 NetBench Loopback Calibration", box=box.SIMPLE_HEAVY)
+    tbl.add_column("Metric", style="bold cyan")
+    tbl.add_column("Value", style="bold magenta")
+    tbl.add_row("Max Measurable (engine)", format_speed(stats["aggregate_bps"]))
+    tbl.add_row("Sampler Avg / Peak", f"{format_speed(sampled_avg)} / {format_speed(result['sampled_peak_mbps'] * 1e6)}")
+    tbl.add_row("Sampler vs Engine", f"{result['sampler_vs_engine_pct']:.1f} %")
+    tbl.add_row("Engine CPU", f"{stats['cpu_pct']:.1f} % ({stats['cpu_per_gbps']:.1f} % per Gbps)")
+    tbl.add_row("Process / System CPU", f"{process_cpu:.1f} % / {system_cpu:.1f} %")
+    tbl.add_row("Sampling Lateness", f"mean {result['lateness_mean_ms']:.2f} ms, p99 {result['lateness_p99_ms']:.2f} ms, max {result['lateness_max_ms']:.2f} ms")
+    tbl.add_row("Interval Jitter", f"{interval_jitter:.3f} ms (σ over {len(intervals)} samples)")
+    tbl.add_row("Missed Ticks / Errors", f"{ticker.missed} / {stats['errors']}")
+    console.print(tbl)
+    folder = os.path.join(base_dir, "History")
+    os.makedirs(folder, exist_ok=True)
+    out_path = os.path.join(folder, f"calibration_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    with open(out_path, "w") as f:
+        json.dump(result, f, indent=2)
+    console.print(f"[bold green]Saved calibration to {out_path}[/bold green]")
+
+# Wait for the first counter sample, then print the startup report
+def report_startup():
+    if not startup.wait_for("first sample", timeout=max(10.0, sample_interval * 5)):
+        console.print("[red]No sample collected within the timeout[/red]")
+    console.print(startup.table())
 
 # CLI and Main
 def main():
     parser = argparse.ArgumentParser(description="Net Benchmark Extended Monitor")
     parser.add_argument("-t", "--threshold", type=float, default=1.0, help="Alert threshold Mbps")
     parser.add_argument("-s", "--save-interval", type=int, default=300, help="Periodic save interval seconds")
+    parser.add_argument("--json-snapshot", action="store_true",
+                        help="Rewrite the JSON snapshot of a jsonl journal every save interval (default: at exit only)")
     parser.add_argument("--history-limit", type=int, default=60, help="Number of points for sparkline")
+    parser.add_argument("-i", "--interval", type=float, default=1.0,
+                        help="Interface counter sampling interval in seconds (0.01 - 1.0 for microbursts)")
+    parser.add_argument("--system-interval", type=float, default=1.0,
+                        help="CPU/memory/interface error polling interval in seconds")
+    parser.add_argument("--conn-interval", type=float, default=5.0,
+                        help="TCP/UDP connection count interval in seconds")
+    parser.add_argument("--proc-interval", type=float, default=10.0,
+                        help="Per-process bandwidth scan interval in seconds")
+    parser.add_argument("--history-capacity", type=int, default=3600,
+                        help="Number of samples kept in memory (e.g. 86400 for 24h at 1 Hz)")
+    parser.add_argument("--flush-interval", type=float, default=1.0,
+                        help="Seconds between history flushes (0 = every batch)")
+    parser.add_argument("--fsync", choices=["never", "interval", "always"], default="never",
+                        help="fsync policy for history files")
+    parser.add_argument("--write-queue", type=int, default=4096,
+                        help="Rows buffered for the history writer before samples are dropped")
+    parser.add_argument("--history-format", choices=["jsonl", "columns", "tiered"], default="jsonl",
+                        help="Session history format: jsonl journal (default), binary columns, or bounded tiered rollups")
+    parser.add_argument("--retention", default="", metavar="TIER=DURATION,...",
+                        help="Tiered format retention, e.g. raw=1h,10s=1d,1m=7d,1h=365d")
+    parser.add_argument("--streams", type=int, default=4, help="Parallel stress download streams")
+    parser.add_argument("--url", action="append", dest="urls",
+                        help="Stress download URL (repeat for several; streams rotate over them)")
+    parser.add_argument("--target-rate", type=float, default=0.0,
+                        help="Aggregate stress download cap in Mbps (0 = unlimited)")
+    parser.add_argument("--engine", choices=["asyncio", "threads"], default="asyncio",
+                        help="Stress traffic engine: asyncio event loop (default) or one thread per stream")
+    parser.add_argument("--recv-mode", choices=["zerocopy", "stream"], default="zerocopy",
+                        help="asyncio download receive path: recv_into a preallocated buffer (default) or StreamReader")
+    parser.add_argument("--rcvbuf", type=int, default=0, help="SO_RCVBUF for stress connections in bytes (0 = OS default)")
+    parser.add_argument("--sndbuf", type=int, default=0, help="SO_SNDBUF for stress connections in bytes (0 = OS default)")
+    parser.add_argument("--calibrate", type=float, nargs="?", const=10.0, default=None, metavar="SECONDS",
+                        help="Measure the tool's own ceiling over loopback (default 10 s) and exit")
+    parser.add_argument("--bufferbloat", type=float, nargs="?", const=10.0, default=None, metavar="SECONDS",
+                        help="Run the latency-under-load test (idle, download, upload, bidirectional; "
+                             "default 10 s per phase) and exit")
+    parser.add_argument("--bufferbloat-rate", type=float, default=20.0,
+                        help="Probes per second per target during the latency-under-load test")
+    parser.add_argument("--local-server", action="store_true",
+                        help="Download from a built-in local HTTP server (offline test)")
+    parser.add_argument("--probe-host", dest="probe_hosts", action="append", metavar="HOST",
+                        help="Latency probe target in addition to gateway and DNS (repeatable, default 8.8.8.8)")
+    parser.add_argument("--probe-rate", type=float, default=5.0, help="Latency probes per second per target")
+    parser.add_argument("--probe-window", type=int, default=100, help="Probes in the loss/percentile window")
+    parser.add_argument("--probe-mode", choices=PROBE_MODES, default="auto",
+                        help="ICMP echo, UDP to a closed port (Linux), or auto")
+    parser.add_argument("--upload-url", default=DEFAULT_UPLOAD_URL,
+                        help="Upload test endpoint (HTTP POST sink), or 'local' for the built-in sink server")
+    parser.add_argument("--upload-connections", type=int, default=4, help="Parallel upload test connections")
+    parser.add_argument("--upload-duration", type=float, default=10.0, help="Upload test duration in seconds")
+    parser.add_argument("--interface", metavar="NAME", help="Interface to monitor (skips the selection prompt)")
+    parser.add_argument("--all-interfaces", action="store_true",
+                        help="Monitor every interface that is up: aggregate plus per-interface rates, errors and drops "
+                             "(--interface then picks the one whose IP/gateway/WiFi details are shown)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print import and initialization timings up to the first sample, then exit")
     args = parser.parse_args()
-    global alert_threshold, save_interval, history_limit
+    if args.profile_startup and (args.bufferbloat is not None or args.calibrate is not None):
+        # Profiling opens no session files, which those tests write their results next to
+        parser.error("--profile-startup cannot be combined with --bufferbloat or --calibrate")
+    startup.mark("arguments")
+    global alert_threshold, save_interval, json_snapshot, history_limit, history_format, history_capacity, history_tiers
+    global flush_interval, fsync_policy, write_queue_size, sample_interval
+    global upload_url, upload_connections, upload_duration
+    global probe_hosts, probe_rate, probe_window, probe_mode, bufferbloat_rate
+    global system_interval, connections_interval, processes_interval
+    global traffic_urls, traffic_streams, traffic_target_bps, traffic_engine
+    global traffic_recv_mode, traffic_rcvbuf, traffic_sndbuf
     alert_threshold = args.threshold
+    history_format = args.history_format
+    try:
+        history_tiers = parse_retention(args.retention)
+    except ValueError as e:
+        parser.error(f"--retention: {e}")
+    flush_interval = args.flush_interval
+    fsync_policy = args.fsync
+    write_queue_size = args.write_queue
     save_interval = args.save_interval
+    json_snapshot = args.json_snapshot
     history_limit = args.history_limit
-    get_network_info()
+    history_capacity = args.history_capacity
+    sample_interval = max(0.01, args.interval)
+    system_interval = args.system_interval
+    connections_interval = args.conn_interval
+    processes_interval = args.proc_interval
+    if args.probe_hosts:
+        probe_hosts = args.probe_hosts
+    probe_rate = max(0.1, args.probe_rate)
+    probe_window = max(1, args.probe_window)
+    probe_mode = args.probe_mode
+    bufferbloat_rate = max(1.0, args.bufferbloat_rate)
+    upload_url = args.upload_url
+    upload_connections = max(1, args.upload_connections)
+    upload_duration = args.upload_duration
+    traffic_streams = max(1, args.streams)
+    traffic_target_bps = args.target_rate * 1e6
+    traffic_engine = args.engine
+    traffic_recv_mode = args.recv_mode
+    traffic_rcvbuf = args.rcvbuf
+    traffic_sndbuf = args.sndbuf
+    if args.urls:
+        traffic_urls = args.urls
+    if args.local_server:
+        traffic_urls = [f"{local_server_url()}/download"]
+    telemetry_data["history"] = RingBuffer(["t", "download", "upload"], history_capacity)
+    if args.calibrate is not None:
+        run_calibration(args.calibrate)
+        return
+    if args.all_interfaces:
+        select_all_interfaces(args.interface)
+    else:
+        get_network_info(args.interface)
+    startup.mark("interface")
     update_wifi_info_once()  # Tambahkan ini agar SSID sudah terisi sebelum init file
-    init_telemetry_files()
+    startup.mark("wifi info")
+    if not args.profile_startup:
+        init_telemetry_files()
+        startup.mark("session files")
+    if args.bufferbloat is not None:
+        # Session history keeps recording while the phases run
+        start_collectors()
+        try:
+            run_bufferbloat_test(args.bufferbloat)
+        finally:
+            close_telemetry_files()
+            save_telemetry_snapshot()
+            save_telemetry_plot()
+        return
+    if args.profile_startup:
+        # Launch cost up to the first sample only: just the counter sampler,
+        # nothing that sends traffic (public IP lookup, latency probes, speed
+        # tests), no network watcher and no session left behind in History/
+        start_collectors(counters_only=True)
+        startup.mark("collectors started")
+        report_startup()
+        return
     # Threads
     threading.Thread(target=update_public_ip, daemon=True).start()
-    threading.Thread(target=update_ping_stats, daemon=True).start()
-    threading.Thread(target=update_speed, daemon=True).start()
-    threading.Thread(target=run_one_time_upload_test, args=(10,), daemon=True).start()
+    start_collectors()
+    start_network_watcher()
+    startup.mark("collectors started")
+    threading.Thread(target=run_one_time_upload_test, args=(upload_duration,), daemon=True).start()
     threading.Thread(target=run_speedtest_periodic, daemon=True).start()
     threading.Thread(target=update_wifi_info, daemon=True).start()
     threading.Thread(target=run_continuous_traffic, daemon=True).start()
+    threading.Thread(target=save_periodic, daemon=True).start()
     try:
         telemetry_ui()
     except KeyboardInterrupt:
-        save_telemetry_plot_from_json()
+        close_telemetry_files()
+        save_telemetry_snapshot()
+        png_path = save_telemetry_plot()
+        if png_path:
+            console.print(f"[bold green]Saved plot to {png_path}[/bold green]")
         console.print("\n[bold green]Telemetry plot saved. Exiting.[/bold green]")
 
 if __name__ == "__main__":
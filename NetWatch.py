@@ -0,0 +1,241 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from ProcNet import NETLINK_GENERIC, genl_multicast_group
+
+# Event-driven network change detection (Linux). One thread waits on an
+# rtnetlink socket (link, address and route groups), the nl80211 "mlme"
+# group (connect, roam, disconnect) and an inotify watch on resolv.conf, and
+# reports what kind of state changed once a burst of events has settled.
+
+NETLINK_ROUTE = 0
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+RTM_NEWLINK, RTM_DELLINK = 16, 17
+RTM_NEWADDR, RTM_DELADDR = 20, 21
+RTM_NEWROUTE, RTM_DELROUTE = 24, 25
+RTN_UNICAST = 1
+NL80211_CMD_CONNECT = 46
+NL80211_CMD_ROAM = 47
+NL80211_CMD_DISCONNECT = 48
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_NLMSGHDR = struct.Struct("=LHHLL")
+_IFINFOMSG = struct.Struct("=BxHiII")  # family, type, index, flags, change
+_IFADDRMSG = struct.Struct("=BBBBI")  # family, prefixlen, flags, scope, index
+_RTMSG = struct.Struct("=BBBBBBBBI")  # family, dst_len, src_len, tos, table, protocol, scope, type, flags
+_INOTIFY_EVENT = struct.Struct("=iIII")  # wd, mask, cookie, len
+
+KINDS = ("link", "address", "route", "dns", "wifi")
+
+
+class NetworkWatcher:
+    """Calls ``on_change(kinds)`` when link, address, default route, DNS or
+    WiFi association change.
+
+    ``kinds`` is a set drawn from KINDS. Link and address events of other
+    interfaces than ``interface`` are ignored, and so are routes other than
+    default routes, so container and VPN churn elsewhere does not wake the
+    monitor. Events arriving within ``settle`` seconds of the first are
+    reported together. The callback runs on the watcher thread.
+    """
+
+    def __init__(self, on_change, interface=None, resolv_conf="/etc/resolv.conf", settle=0.5):
+        self.on_change = on_change
+        self.interface = interface
+        self.resolv_conf = resolv_conf
+        self.settle = settle
+        self.events = 0
+        self.error = None
+        self._ifindex = None
+        self._route = None
+        self._wifi = None
+        self._inotify = None
+        self._watched = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Open the event sources; raises OSError when none can be opened."""
+        errors = []
+        if self.interface:
+            try:
+                self._ifindex = socket.if_nametoindex(self.interface)
+            except OSError:
+                self._ifindex = None
+        try:
+            groups = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_IFADDR | RTMGRP_IPV6_ROUTE
+            self._route = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            self._route.bind((0, groups))
+        except OSError as e:
+            errors.append(f"rtnetlink: {e}")
+            self._route = None
+        group = genl_multicast_group("nl80211", "mlme")
+        if group is not None:
+            try:
+                self._wifi = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+                self._wifi.bind((0, 0))
+                self._wifi.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, group)
+            except OSError as e:
+                errors.append(f"nl80211: {e}")
+                self._wifi = None
+        try:
+            self._open_inotify()
+        except OSError as e:
+            errors.append(f"inotify: {e}")
+        if self._route is None and self._inotify is None:
+            raise OSError("; ".join(errors))
+        self.error = "; ".join(errors) or None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _open_inotify(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # resolv.conf is usually replaced by rename, or is a symlink into /run;
+        # watch the directories of both the link and its target
+        paths = {self.resolv_conf, os.path.realpath(self.resolv_conf)}
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        for path in paths:
+            directory = os.path.dirname(path) or "."
+            if libc.inotify_add_watch(fd, directory.encode(), mask) >= 0:
+                self._watched.add(os.path.basename(path))
+        if not self._watched:
+            os.close(fd)
+            raise OSError(errno.ENOENT, f"cannot watch {self.resolv_conf}")
+        self._inotify = fd
+
+    def _read_route(self):
+        kinds = set()
+        while True:
+            try:
+                data = self._route.recv(1 << 16, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return kinds
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    # Receive queue overflowed; events were lost, so re-read everything
+                    kinds.update(("link", "address", "route"))
+                    continue
+                raise
+            off = 0
+            while off + _NLMSGHDR.size <= len(data):
+                msg_len, msg_type, _, _, _ = _NLMSGHDR.unpack_from(data, off)
+                if msg_len < _NLMSGHDR.size:
+                    break
+                body = off + _NLMSGHDR.size
+                off += (msg_len + 3) & ~3
+                if msg_type in (RTM_NEWLINK, RTM_DELLINK) and len(data) >= body + _IFINFOMSG.size:
+                    if self._wanted(_IFINFOMSG.unpack_from(data, body)[2]):
+                        kinds.add("link")
+                elif msg_type in (RTM_NEWADDR, RTM_DELADDR) and len(data) >= body + _IFADDRMSG.size:
+                    if self._wanted(_IFADDRMSG.unpack_from(data, body)[4]):
+                        kinds.add("address")
+                elif msg_type in (RTM_NEWROUTE, RTM_DELROUTE) and len(data) >= body + _RTMSG.size:
+                    _, dst_len, _, _, _, _, _, rtype, _ = _RTMSG.unpack_from(data, body)
+                    if dst_len == 0 and rtype == RTN_UNICAST:
+                        kinds.add("route")
+
+    def _wanted(self, ifindex):
+        return self._ifindex is None or ifindex == self._ifindex
+
+    def _read_wifi(self):
+        kinds = set()
+        while True:
+            try:
+                data = self._wifi.recv(1 << 16, socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return kinds
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    kinds.add("wifi")
+                    continue
+                raise
+            off = 0
+            while off + _NLMSGHDR.size <= len(data):
+                msg_len = _NLMSGHDR.unpack_from(data, off)[0]
+                if msg_len < _NLMSGHDR.size:
+                    break
+                body = off + _NLMSGHDR.size
+                off += (msg_len + 3) & ~3
+                # First byte of the genetlink header is the command
+                if len(data) > body and data[body] in (NL80211_CMD_CONNECT, NL80211_CMD_ROAM, NL80211_CMD_DISCONNECT):
+                    kinds.add("wifi")
+
+    def _read_inotify(self):
+        kinds = set()
+        while True:
+            try:
+                data = os.read(self._inotify, 4096)
+            except BlockingIOError:
+                return kinds
+            off = 0
+            while off + _INOTIFY_EVENT.size <= len(data):
+                _, _, _, name_len = _INOTIFY_EVENT.unpack_from(data, off)
+                name = data[off + _INOTIFY_EVENT.size:off + _INOTIFY_EVENT.size + name_len].rstrip(b"\0")
+                off += _INOTIFY_EVENT.size + name_len
+                if name.decode(errors="replace") in self._watched:
+                    kinds.add("dns")
+
+    def _run(self):
+        sources = {}
+        if self._route is not None:
+            sources[self._route.fileno()] = self._read_route
+        if self._wifi is not None:
+            sources[self._wifi.fileno()] = self._read_wifi
+        if self._inotify is not None:
+            sources[self._inotify] = self._read_inotify
+        pending = set()
+        deadline = None
+        try:
+            while not self._stop.is_set():
+                timeout = 1.0 if deadline is None else max(0.0, deadline - time.monotonic())
+                readable, _, _ = select.select(list(sources), [], [], timeout)
+                for fd in readable:
+                    try:
+                        pending |= sources[fd]()
+                    except OSError as e:
+                        self.error = str(e)
+                if pending and deadline is None:
+                    deadline = time.monotonic() + self.settle
+                if deadline is not None and time.monotonic() >= deadline:
+                    kinds, pending, deadline = pending, set(), None
+                    self.events += 1
+                    try:
+                        self.on_change(kinds)
+                    except Exception as e:
+                        self.error = str(e)
+        finally:
+            for sock in (self._route, self._wifi):
+                if sock is not None:
+                    sock.close()
+            if self._inotify is not None:
+                os.close(self._inotify)
@@ -0,0 +1,313 @@
+import itertools
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+# Concurrent latency prober: every target is probed once per tick from a
+# single socket per address family, and replies are matched by sequence
+# number, so one slow or dead target never delays the others.
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP6_ECHO_REQUEST = 128
+ICMP6_ECHO_REPLY = 129
+# Linux <linux/in.h>, <linux/in6.h>; not exported by the socket module
+IP_RECVERR = 11
+IPV6_RECVERR = 25
+UDP_BASE_PORT = 33434  # traceroute range, normally closed: the host answers "port unreachable"
+
+_ICMP_HEADER = struct.Struct("!BBHHH")
+_SEQ = struct.Struct("!H")
+PAYLOAD_SIZE = 32
+RESOLVE_RETRY = 30.0  # seconds between lookups of a host that did not resolve
+PROBE_MODES = ("auto", "icmp", "udp")
+
+_instances = itertools.count()
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class TargetStats:
+    """Round-trip statistics of one target over a sliding window of probes.
+
+    ``jitter`` is the RFC 3550 interarrival jitter estimate,
+    J += (|D| - J) / 16, where D is the change in RTT between consecutive
+    replies. ``loss`` is the share of the last ``window`` probes that were not
+    answered within the timeout.
+    """
+
+    def __init__(self, label, host, window=100):
+        self.label = label
+        self.host = host
+        self.address = None
+        self.resolved_at = None
+        self.results = deque(maxlen=window)  # rtt in ms, or None when lost
+        self.sent = 0
+        self.received = 0
+        self.jitter = 0.0
+        self.last_rtt = None
+        self.error = None
+
+    def record(self, rtt):
+        self.results.append(rtt)
+        if rtt is None:
+            return
+        self.received += 1
+        if self.last_rtt is not None:
+            self.jitter += (abs(rtt - self.last_rtt) - self.jitter) / 16
+        self.last_rtt = rtt
+
+    def summary(self):
+        rtts = sorted(r for r in self.results if r is not None)
+        done = len(self.results)
+        return {
+            "host": self.host,
+            "address": self.address,
+            "rtt": self.last_rtt or 0.0,
+            "mean": sum(rtts) / len(rtts) if rtts else 0.0,
+            "p50": percentile(rtts, 50),
+            "p95": percentile(rtts, 95),
+            "p99": percentile(rtts, 99),
+            "jitter": self.jitter,
+            "loss": (done - len(rtts)) / done * 100 if done else 0.0,
+            "sent": self.sent,
+            "received": self.received,
+            "error": self.error,
+        }
+
+
+class LatencyProber:
+    """Probes several targets in parallel at a fixed rate.
+
+    ``targets`` is a list of (label, host). ``mode`` is "icmp" (echo over an
+    unprivileged ping socket, or a raw socket when allowed), "udp" (datagrams
+    to a closed port, timed by the ICMP port-unreachable answer read from the
+    socket error queue; Linux only) or "auto" (icmp, then udp).
+    ``on_reply(label, rtt, jitter)`` is called from the probe thread for
+    every answered probe.
+    """
+
+    def __init__(self, targets, rate=5.0, window=100, timeout=1.0, mode="auto", on_reply=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.window = window
+        self.timeout = timeout
+        self.mode = mode
+        self.on_reply = on_reply
+        self.kind = None  # socket kind actually in use, e.g. "icmp-dgram"
+        self.error = None
+        self.targets = {}
+        self._lock = threading.Lock()
+        self._sockets = {}
+        self._pending = {}  # seq -> (stats, send time)
+        self._seq = 0
+        # Raw sockets see every echo reply; keep concurrent probers apart
+        self._ident = (os.getpid() + next(_instances)) & 0xFFFF
+        self._stop = threading.Event()
+        self._thread = None
+        self.set_targets(targets)
+
+    def set_targets(self, targets):
+        """Replace the target list; statistics of kept labels survive."""
+        with self._lock:
+            old = self.targets
+            self.targets = {}
+            for label, host in targets:
+                stats = old.get(label)
+                if stats is None or stats.host != host:
+                    stats = TargetStats(label, host, self.window)
+                self.targets[label] = stats
+
+    def stats(self):
+        with self._lock:
+            return {label: st.summary() for label, st in self.targets.items()}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _open(self, family):
+        modes = ["icmp", "udp"] if self.mode == "auto" else [self.mode]
+        errors = []
+        for mode in modes:
+            try:
+                if mode == "udp":
+                    sock = socket.socket(family, socket.SOCK_DGRAM)
+                    if family == socket.AF_INET6:
+                        sock.setsockopt(socket.IPPROTO_IPV6, IPV6_RECVERR, 1)
+                    else:
+                        sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+                    sock.setblocking(False)
+                    return sock, "udp"
+                proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+                for sock_type, kind in ((socket.SOCK_DGRAM, "icmp-dgram"), (socket.SOCK_RAW, "icmp-raw")):
+                    try:
+                        sock = socket.socket(family, sock_type, proto)
+                    except OSError as e:
+                        errors.append(f"{kind}: {e}")
+                        continue
+                    sock.setblocking(False)
+                    return sock, kind
+            except OSError as e:
+                errors.append(f"{mode}: {e}")
+        raise OSError("; ".join(errors) or "no usable probe socket")
+
+    def _socket(self, family):
+        entry = self._sockets.get(family)
+        if entry is None:
+            entry = self._open(family)
+            self._sockets[family] = entry
+            self.kind = entry[1]
+        return entry
+
+    def _resolve(self, stats):
+        if stats.address is not None:
+            return True
+        now = time.monotonic()
+        if stats.resolved_at is not None and now - stats.resolved_at < RESOLVE_RETRY:
+            return False
+        stats.resolved_at = now
+        try:
+            info = socket.getaddrinfo(stats.host, None, type=socket.SOCK_DGRAM)[0]
+        except (OSError, UnicodeError) as e:
+            stats.error = str(e)
+            return False
+        stats.address = (info[0], info[4][0])
+        stats.error = None
+        return True
+
+    def _send(self, stats):
+        family, address = stats.address
+        try:
+            sock, kind = self._socket(family)
+        except OSError as e:
+            stats.error = self.error = str(e)
+            return
+        self._seq = (self._seq + 1) & 0xFFFF
+        seq = self._seq
+        if kind == "udp":
+            packet = _SEQ.pack(seq) + b"\0" * (PAYLOAD_SIZE - _SEQ.size)
+            dest = (address, UDP_BASE_PORT + seq % 64)
+        else:
+            echo = ICMP6_ECHO_REQUEST if family == socket.AF_INET6 else ICMP_ECHO_REQUEST
+            payload = b"\0" * PAYLOAD_SIZE
+            packet = _ICMP_HEADER.pack(echo, 0, 0, self._ident, seq) + payload
+            if family == socket.AF_INET:
+                # ICMPv6 and ping sockets get their checksum from the kernel
+                csum = _checksum(packet)
+                packet = _ICMP_HEADER.pack(echo, 0, csum, self._ident, seq) + payload
+            dest = (address, 0)
+        sent_at = time.perf_counter()
+        try:
+            try:
+                sock.sendto(packet, dest)
+            except ConnectionRefusedError:
+                # A queued port-unreachable from an earlier probe; the error is now consumed
+                sock.sendto(packet, dest)
+        except OSError as e:
+            with self._lock:
+                stats.error = str(e)
+                stats.sent += 1
+                stats.record(None)
+            return
+        with self._lock:
+            stats.sent += 1
+            stats.error = None
+        self._pending[seq] = (stats, sent_at)
+
+    def _receive(self, sock, kind, family, now):
+        while True:
+            try:
+                if kind == "udp":
+                    data, _, _, addr = sock.recvmsg(512, 512, socket.MSG_ERRQUEUE)
+                else:
+                    data, addr = sock.recvfrom(512)
+            except OSError:
+                return
+            if kind == "udp":
+                if len(data) < _SEQ.size:
+                    continue
+                seq = _SEQ.unpack_from(data)[0]
+            else:
+                if kind == "icmp-raw" and family == socket.AF_INET:
+                    data = data[(data[0] & 0x0F) * 4:]
+                if len(data) < _ICMP_HEADER.size:
+                    continue
+                icmp_type, _, _, ident, seq = _ICMP_HEADER.unpack_from(data)
+                reply = ICMP6_ECHO_REPLY if family == socket.AF_INET6 else ICMP_ECHO_REPLY
+                if icmp_type != reply or (kind == "icmp-raw" and ident != self._ident):
+                    continue
+            entry = self._pending.get(seq)
+            if entry is None or entry[0].address[1] != addr[0]:
+                continue
+            del self._pending[seq]
+            stats, sent_at = entry
+            rtt = (now - sent_at) * 1000
+            with self._lock:
+                stats.record(rtt)
+            if self.on_reply:
+                self.on_reply(stats.label, rtt, stats.jitter)
+
+    def _expire(self, now):
+        for seq, (stats, sent_at) in list(self._pending.items()):
+            if now - sent_at >= self.timeout:
+                del self._pending[seq]
+                with self._lock:
+                    stats.record(None)
+
+    def _run(self):
+        period = 1.0 / self.rate
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            with self._lock:
+                targets = list(self.targets.values())
+            # Resolve first so a slow lookup never sits between a send and its reply
+            targets = [stats for stats in targets if self._resolve(stats)]
+            for stats in targets:
+                self._send(stats)
+            deadline += period
+            now = time.monotonic()
+            if deadline <= now:
+                deadline = now + period
+            # Wait for replies until the next tick
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                socks = {sock: (kind, family) for family, (sock, kind) in self._sockets.items()}
+                if not socks:
+                    time.sleep(remaining)
+                    break
+                readable, _, _ = select.select(list(socks), [], [], remaining)
+                received_at = time.perf_counter()
+                for sock in readable:
+                    kind, family = socks[sock]
+                    self._receive(sock, kind, family, received_at)
+            self._expire(time.perf_counter())
+        for sock, _ in self._sockets.values():
+            sock.close()
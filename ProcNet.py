@@ -0,0 +1,567 @@
+import os
+import socket
+import struct
+import sys
+import time
+import psutil
+
+# Helpers that read socket, process, route and link state straight from the
+# kernel (netlink, /proc, /sys) instead of going through psutil or spawning
+# tools like ip, iwgetid and iwconfig.
+
+NETLINK_SOCK_DIAG = 4
+NETLINK_GENERIC = 16
+SOCK_DIAG_BY_FAMILY = 20
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_DUMP = 0x300
+NLA_TYPE_MASK = 0x3FFF
+INET_DIAG_INFO = 2
+ALL_STATES = 0xFFFFFFFF
+
+# Generic netlink controller and nl80211 (<linux/genetlink.h>, <linux/nl80211.h>)
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+NL80211_CMD_GET_INTERFACE = 5
+NL80211_CMD_GET_STATION = 17
+NL80211_ATTR_IFINDEX = 3
+NL80211_ATTR_IFNAME = 4
+NL80211_ATTR_STA_INFO = 21
+NL80211_ATTR_WIPHY_FREQ = 38
+NL80211_ATTR_SSID = 52
+NL80211_STA_INFO_SIGNAL = 7
+
+# /proc/net/route flags
+RTF_UP = 0x1
+RTF_GATEWAY = 0x2
+
+_NLMSGHDR = struct.Struct("=LHHLL")
+_GENLMSGHDR = struct.Struct("=BBH")
+_DIAG_REQ = struct.Struct("=BBBxI48x")
+_DIAG_MSG_HEAD = struct.Struct("=BBBB")
+_DIAG_MSG_TAIL = struct.Struct("=LLLLL")  # expires, rqueue, wqueue, uid, inode
+_DIAG_MSG_SIZE = 72
+_RTATTR = struct.Struct("=HH")
+# struct tcp_info: tcpi_bytes_acked / tcpi_bytes_received (Linux 4.1+ / 4.2+)
+_TCPI_BYTES = struct.Struct("=QQ")
+_TCPI_BYTES_OFFSET = 120
+
+TCP_STATES = {
+    1: "ESTABLISHED",
+    2: "SYN_SENT",
+    3: "SYN_RECV",
+    4: "FIN_WAIT1",
+    5: "FIN_WAIT2",
+    6: "TIME_WAIT",
+    7: "CLOSE",
+    8: "CLOSE_WAIT",
+    9: "LAST_ACK",
+    10: "LISTEN",
+    11: "CLOSING",
+    12: "NEW_SYN_RECV",
+}
+
+_seq = 0
+_genl_families = {}
+
+
+def is_linux():
+    return sys.platform.startswith("linux")
+
+
+def parse_attrs(data, pos, end):
+    """Map netlink attribute type to its payload (a memoryview) for data[pos:end]."""
+    attrs = {}
+    while pos + _RTATTR.size <= end:
+        rta_len, rta_type = _RTATTR.unpack_from(data, pos)
+        if rta_len < _RTATTR.size:
+            break
+        attrs[rta_type & NLA_TYPE_MASK] = data[pos + _RTATTR.size:pos + rta_len]
+        pos += (rta_len + 3) & ~3
+    return attrs
+
+
+def _attr(attr_type, value):
+    size = _RTATTR.size + len(value)
+    return _RTATTR.pack(size, attr_type) + value + b"\0" * (-size % 4)
+
+
+def netlink_request(protocol, msg_type, payload, flags=NLM_F_REQUEST | NLM_F_DUMP):
+    """Send one netlink request and yield (msg_type, data, body, end) per reply.
+
+    ``data[body:end]`` is the message payload after the netlink header. Dumps
+    end at NLMSG_DONE, plain requests after their single reply; a kernel
+    error is raised as OSError.
+    """
+    global _seq
+    _seq += 1
+    seq = _seq
+    hdr = _NLMSGHDR.pack(_NLMSGHDR.size + len(payload), msg_type, flags, seq, 0)
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, protocol) as sock:
+        sock.bind((0, 0))
+        sock.send(hdr + payload)
+        while True:
+            data = memoryview(sock.recv(1 << 16))
+            if not data:
+                return
+            off = 0
+            while off + _NLMSGHDR.size <= len(data):
+                msg_len, msg_type, msg_flags, msg_seq, _ = _NLMSGHDR.unpack_from(data, off)
+                if msg_len < _NLMSGHDR.size:
+                    return
+                body = off + _NLMSGHDR.size
+                end = off + msg_len
+                off += (msg_len + 3) & ~3
+                if msg_seq != seq:
+                    continue
+                if msg_type == NLMSG_DONE:
+                    return
+                if msg_type == NLMSG_ERROR:
+                    err = -struct.unpack_from("=i", data, body)[0]
+                    if err:
+                        raise OSError(err, os.strerror(err))
+                    return
+                yield msg_type, data, body, end
+                if not msg_flags & NLM_F_MULTI:
+                    return
+
+
+def sock_diag_dump(family, protocol, ext=0, states=ALL_STATES):
+    """Yield (state, inode, attrs) for every socket of ``family``/``protocol``.
+
+    ``attrs`` maps netlink attribute type to its payload (a memoryview) and is
+    only populated for the extensions requested in ``ext``.
+    """
+    req = _DIAG_REQ.pack(family, protocol, ext, states)
+    for _, data, body, end in netlink_request(NETLINK_SOCK_DIAG, SOCK_DIAG_BY_FAMILY, req):
+        _, state, _, _ = _DIAG_MSG_HEAD.unpack_from(data, body)
+        inode = _DIAG_MSG_TAIL.unpack_from(data, body + 52)[4]
+        yield state, inode, parse_attrs(data, body + _DIAG_MSG_SIZE, end)
+
+
+def tcp_flow_bytes():
+    """Return {inode: (bytes_acked, bytes_received)} for all TCP sockets."""
+    flows = {}
+    ext = 1 << (INET_DIAG_INFO - 1)
+    for family in (socket.AF_INET, socket.AF_INET6):
+        for _, inode, attrs in sock_diag_dump(family, socket.IPPROTO_TCP, ext):
+            info = attrs.get(INET_DIAG_INFO)
+            if inode and info is not None and len(info) >= _TCPI_BYTES_OFFSET + _TCPI_BYTES.size:
+                flows[inode] = _TCPI_BYTES.unpack_from(info, _TCPI_BYTES_OFFSET)
+    return flows
+
+
+def tcp_info_bytes(sock):
+    """(bytes_acked, bytes_received) of a connected TCP socket, or None if unsupported."""
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 256)
+    except (AttributeError, OSError):
+        return None
+    if len(info) < _TCPI_BYTES_OFFSET + _TCPI_BYTES.size:
+        return None
+    return _TCPI_BYTES.unpack_from(info, _TCPI_BYTES_OFFSET)
+
+
+def _count_proc_net(name, states=None):
+    total = 0
+    for suffix in ("", "6"):
+        try:
+            with open(f"/proc/net/{name}{suffix}") as f:
+                next(f, None)
+                for line in f:
+                    total += 1
+                    if states is not None:
+                        # Fourth column is the state in hex
+                        state = int(line.split(None, 4)[3], 16)
+                        states[state] = states.get(state, 0) + 1
+        except OSError:
+            continue
+    return total
+
+
+def connection_stats():
+    """Count TCP/UDP sockets without resolving owning processes.
+
+    Uses a sock_diag netlink dump and falls back to /proc/net/{tcp,udp}[6].
+    Returns {"tcp": n, "udp": n, "tcp_states": {state name: n}}.
+    """
+    states = {}
+    try:
+        tcp = udp = 0
+        for family in (socket.AF_INET, socket.AF_INET6):
+            for state, _, _ in sock_diag_dump(family, socket.IPPROTO_TCP):
+                tcp += 1
+                states[state] = states.get(state, 0) + 1
+            for _ in sock_diag_dump(family, socket.IPPROTO_UDP):
+                udp += 1
+    except OSError:
+        states = {}
+        tcp = _count_proc_net("tcp", states)
+        udp = _count_proc_net("udp")
+    named = {TCP_STATES.get(state, str(state)): count for state, count in states.items()}
+    return {"tcp": tcp, "udp": udp, "tcp_states": named}
+
+
+def _socket_inodes(pid):
+    inodes = set()
+    fd_dir = f"/proc/{pid}/fd"
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return inodes
+    for fd in fds:
+        try:
+            link = os.readlink(f"{fd_dir}/{fd}")
+        except OSError:
+            continue
+        if link.startswith("socket:["):
+            inodes.add(int(link[8:-1]))
+    return inodes
+
+
+class ProcessCache:
+    """Persistent pid -> (name, create_time) table.
+
+    ``refresh`` lists pids once, reads static attributes only for pids it has
+    not seen before and evicts pids that are gone, so its cost follows
+    process churn rather than process count.
+    """
+
+    def __init__(self):
+        self.procs = {}
+        self.stats = {"pids": 0, "hits": 0, "new": 0, "evicted": 0, "scan_ms": 0.0}
+
+    def refresh(self):
+        """Update the table and return (new_pids, dead_pids)."""
+        began = time.perf_counter()
+        pids = set(psutil.pids())
+        dead = [pid for pid in self.procs if pid not in pids]
+        for pid in dead:
+            del self.procs[pid]
+        new = []
+        for pid in pids:
+            if pid in self.procs:
+                continue
+            try:
+                proc = psutil.Process(pid)
+                self.procs[pid] = (proc.name(), proc.create_time())
+            except psutil.AccessDenied:
+                self.procs[pid] = ("?", 0.0)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                continue
+            new.append(pid)
+        self.stats["pids"] = len(self.procs)
+        self.stats["hits"] = len(self.procs) - len(new)
+        self.stats["new"] = len(new)
+        self.stats["evicted"] = len(dead)
+        self.stats["scan_ms"] = (time.perf_counter() - began) * 1000
+        return new, dead
+
+    def name(self, pid):
+        entry = self.procs.get(pid)
+        return entry[0] if entry else "?"
+
+
+class SocketOwners:
+    """Incrementally maintained socket inode -> pid map.
+
+    New pids have their fd tables read once; dead pids are dropped. When a
+    socket with an unknown owner shows up for the first time, pids that
+    already own sockets are rescanned. Sockets still unowned after that are
+    remembered and not searched for again, except by a rescan of all pids at
+    most once per ``rescan_interval`` seconds; keep that a multiple of the
+    update cadence. ``stats`` holds the fd scans and total time of the last
+    update, including the process table refresh.
+    """
+
+    def __init__(self, processes, rescan_interval=60.0):
+        self.processes = processes
+        self.rescan_interval = rescan_interval
+        self.inode_pid = {}
+        self.pid_inodes = {}
+        self.unowned = set()
+        self.fd_scans = 0
+        self.stats = {"fd_scans": 0, "unowned": 0, "scan_ms": 0.0}
+        self._last_full = time.monotonic()
+
+    def _scan(self, pid):
+        for inode in self.pid_inodes.get(pid, ()):
+            if self.inode_pid.get(inode) == pid:
+                del self.inode_pid[inode]
+        inodes = _socket_inodes(pid)
+        self.pid_inodes[pid] = inodes
+        for inode in inodes:
+            self.inode_pid[inode] = pid
+        self.fd_scans += 1
+
+    def update(self, inodes):
+        began = time.perf_counter()
+        scans = self.fd_scans
+        new, dead = self.processes.refresh()
+        for pid in dead:
+            for inode in self.pid_inodes.pop(pid, ()):
+                if self.inode_pid.get(inode) == pid:
+                    del self.inode_pid[inode]
+        for pid in new:
+            self._scan(pid)
+        missing = {i for i in inodes if i not in self.inode_pid}
+        if missing:
+            now = time.monotonic()
+            if now - self._last_full >= self.rescan_interval:
+                self._last_full = now
+                rescan = list(self.processes.procs)
+            elif missing - self.unowned:
+                # Processes that already own sockets are the likely owners of new ones
+                rescan = [pid for pid, owned in self.pid_inodes.items() if owned]
+            else:
+                rescan = []
+            for pid in rescan:
+                self._scan(pid)
+            missing = {i for i in missing if i not in self.inode_pid}
+        self.unowned = missing
+        self.stats["fd_scans"] = self.fd_scans - scans
+        self.stats["unowned"] = len(missing)
+        self.stats["scan_ms"] = (time.perf_counter() - began) * 1000
+        return self.inode_pid
+
+
+class ProcessBandwidth:
+    """Per-process TCP throughput from tcp_info byte counters.
+
+    Each sample diffs bytes_acked (sent) and bytes_received per socket since
+    the previous sample and sums them per owning pid. Sockets that appear
+    between samples count all of their bytes. The first sample only records
+    the baseline and fills the process and socket owner tables.
+    """
+
+    def __init__(self, rescan_interval=60.0, processes=None):
+        self.processes = processes or ProcessCache()
+        self.owners = SocketOwners(self.processes, rescan_interval)
+        self._flows = None
+        self._last = 0.0
+
+    def sample(self, top=5, min_mbps=0.0):
+        flows = tcp_flow_bytes()
+        now = time.monotonic()
+        prev, self._flows = self._flows, flows
+        elapsed, self._last = now - self._last, now
+        owners = self.owners.update(flows)
+        if prev is None or elapsed <= 0:
+            return []
+        per_pid = {}
+        for inode, (sent, recv) in flows.items():
+            pid = owners.get(inode)
+            if pid is None:
+                continue
+            old_sent, old_recv = prev.get(inode, (0, 0))
+            up, down = per_pid.get(pid, (0, 0))
+            per_pid[pid] = (up + max(0, sent - old_sent), down + max(0, recv - old_recv))
+        result = []
+        for pid, (up, down) in per_pid.items():
+            up_mbps = up * 8 / elapsed / 1e6
+            down_mbps = down * 8 / elapsed / 1e6
+            if up_mbps > min_mbps or down_mbps > min_mbps:
+                result.append((pid, self.processes.name(pid), up_mbps, down_mbps))
+        result.sort(key=lambda x: x[2] + x[3], reverse=True)
+        return result[:top]
+
+
+def _read_sys(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def default_gateway(interface=None):
+    """Default gateway address from /proc/net/route (IPv6 from /proc/net/ipv6_route).
+
+    Routes out of ``interface`` win over other interfaces, then the lowest
+    metric. Returns None when there is no default route.
+    """
+    best = None
+    try:
+        with open("/proc/net/route") as f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) < 8 or parts[1] != "00000000" or parts[7] != "00000000":
+                    continue
+                flags = int(parts[3], 16)
+                if flags & (RTF_UP | RTF_GATEWAY) != RTF_UP | RTF_GATEWAY:
+                    continue
+                key = (parts[0] != interface, int(parts[6]))
+                if best is None or key < best[0]:
+                    best = (key, socket.inet_ntoa(struct.pack("<L", int(parts[2], 16))))
+    except OSError:
+        pass
+    if best is not None:
+        return best[1]
+    try:
+        with open("/proc/net/ipv6_route") as f:
+            for line in f:
+                # dest, dest prefix, src, src prefix, next hop, metric, refcnt, use, flags, iface
+                parts = line.split()
+                if len(parts) < 10 or parts[1] != "00" or int(parts[0], 16) or not int(parts[4], 16):
+                    continue
+                key = (parts[9] != interface, int(parts[5], 16))
+                if best is None or key < best[0]:
+                    best = (key, socket.inet_ntop(socket.AF_INET6, bytes.fromhex(parts[4])))
+    except OSError:
+        pass
+    return best[1] if best is not None else None
+
+
+def link_state(interface):
+    """Operational state, carrier, speed (Mb/s), MTU and wireless flag from /sys/class/net."""
+    base = f"/sys/class/net/{interface}"
+    # speed and carrier can only be read while the link is up (EINVAL otherwise)
+    speed = _read_sys(f"{base}/speed")
+    mtu = _read_sys(f"{base}/mtu")
+    return {
+        "operstate": _read_sys(f"{base}/operstate") or "unknown",
+        "carrier": _read_sys(f"{base}/carrier") == "1",
+        "speed": int(speed) if speed and int(speed) > 0 else None,
+        "mtu": int(mtu) if mtu else None,
+        "wireless": os.path.exists(f"{base}/phy80211") or os.path.isdir(f"{base}/wireless"),
+    }
+
+
+def interface_master(interface):
+    """Bond, bridge or team device ``interface`` is enslaved to, or None."""
+    try:
+        return os.path.basename(os.readlink(f"/sys/class/net/{interface}/master"))
+    except OSError:
+        return None
+
+
+def default_route_interface():
+    """Interface of the lowest-metric IPv4 default route, or None."""
+    best = None
+    try:
+        with open("/proc/net/route") as f:
+            next(f, None)
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 8 and parts[1] == "00000000" and parts[7] == "00000000" and int(parts[3], 16) & RTF_UP:
+                    if best is None or int(parts[6]) < best[0]:
+                        best = (int(parts[6]), parts[0])
+    except OSError:
+        pass
+    return best[1] if best is not None else None
+
+
+def wireless_signal(interface):
+    """Signal level of ``interface`` from /proc/net/wireless, or None."""
+    try:
+        with open("/proc/net/wireless") as f:
+            for line in f:
+                name, sep, rest = line.partition(":")
+                if not sep or name.strip() != interface:
+                    continue
+                # status, link quality, signal level, noise
+                return float(rest.split()[2].rstrip("."))
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _genl_lookup(name):
+    if name in _genl_families:
+        return _genl_families[name]
+    payload = _GENLMSGHDR.pack(CTRL_CMD_GETFAMILY, 1, 0) + _attr(CTRL_ATTR_FAMILY_NAME, name.encode() + b"\0")
+    family, groups = None, {}
+    try:
+        for _, data, body, end in netlink_request(NETLINK_GENERIC, GENL_ID_CTRL, payload, NLM_F_REQUEST):
+            attrs = parse_attrs(data, body + _GENLMSGHDR.size, end)
+            family = struct.unpack("=H", attrs[CTRL_ATTR_FAMILY_ID][:2])[0]
+            nested = attrs.get(CTRL_ATTR_MCAST_GROUPS)
+            if nested is not None:
+                for entry in parse_attrs(nested, 0, len(nested)).values():
+                    grp = parse_attrs(entry, 0, len(entry))
+                    grp_name = bytes(grp.get(CTRL_ATTR_MCAST_GRP_NAME, b"")).rstrip(b"\0").decode()
+                    if CTRL_ATTR_MCAST_GRP_ID in grp:
+                        groups[grp_name] = struct.unpack("=I", grp[CTRL_ATTR_MCAST_GRP_ID][:4])[0]
+    except (OSError, KeyError):
+        family, groups = None, {}
+    if family is not None:
+        # Failures are not cached: the module may load later (e.g. a WiFi
+        # adapter plugged in) or the error may be transient
+        _genl_families[name] = (family, groups)
+    return family, groups
+
+
+def genl_family(name):
+    """Numeric id of a generic netlink family, or None if the kernel lacks it."""
+    return _genl_lookup(name)[0]
+
+
+def genl_multicast_group(name, group):
+    """Multicast group id of a generic netlink family (e.g. nl80211 "mlme"), or None."""
+    return _genl_lookup(name)[1].get(group)
+
+
+def freq_to_channel(mhz):
+    if mhz == 2484:
+        return 14
+    if 2412 <= mhz < 2484:
+        return (mhz - 2407) // 5
+    if 5950 < mhz <= 7125:
+        return (mhz - 5950) // 5
+    if 5000 <= mhz < 5950:
+        return (mhz - 5000) // 5
+    return None
+
+
+def wifi_info(interface=None):
+    """SSID, frequency (MHz) and signal (dBm) of a wireless interface via nl80211.
+
+    Uses ``interface`` when it is wireless, otherwise the first wireless
+    interface that is associated. Returns None when there is none.
+    """
+    family = genl_family("nl80211")
+    if family is None:
+        return None
+    found = []
+    try:
+        cmd = _GENLMSGHDR.pack(NL80211_CMD_GET_INTERFACE, 0, 0)
+        for _, data, body, end in netlink_request(NETLINK_GENERIC, family, cmd):
+            attrs = parse_attrs(data, body + _GENLMSGHDR.size, end)
+            if NL80211_ATTR_IFINDEX not in attrs:
+                continue
+            ssid = attrs.get(NL80211_ATTR_SSID)
+            freq = attrs.get(NL80211_ATTR_WIPHY_FREQ)
+            found.append({
+                "interface": bytes(attrs.get(NL80211_ATTR_IFNAME, b"")).rstrip(b"\0").decode(errors="replace"),
+                "ifindex": struct.unpack("=I", attrs[NL80211_ATTR_IFINDEX][:4])[0],
+                "ssid": bytes(ssid).decode(errors="replace") if ssid is not None else None,
+                "frequency": struct.unpack("=I", freq[:4])[0] if freq is not None else None,
+                "signal": None,
+            })
+    except OSError:
+        return None
+    found.sort(key=lambda w: (w["interface"] != interface, w["ssid"] is None))
+    if not found:
+        return None
+    info = found[0]
+    try:
+        cmd = _GENLMSGHDR.pack(NL80211_CMD_GET_STATION, 0, 0) + _attr(NL80211_ATTR_IFINDEX, struct.pack("=I", info["ifindex"]))
+        for _, data, body, end in netlink_request(NETLINK_GENERIC, family, cmd):
+            sta = parse_attrs(data, body + _GENLMSGHDR.size, end).get(NL80211_ATTR_STA_INFO)
+            signal = parse_attrs(sta, 0, len(sta)).get(NL80211_STA_INFO_SIGNAL) if sta is not None else None
+            if signal is not None:
+                info["signal"] = struct.unpack("=b", signal[:1])[0]
+                break
+    except OSError:
+        pass
+    if info["signal"] is None:
+        info["signal"] = wireless_signal(info["interface"])
+    return info
@@ -0,0 +1,47 @@
+from array import array
+
+
+class RingBuffer:
+    """Fixed-capacity history with one preallocated array column per field.
+
+    Every value is stored twice (at ``i`` and ``i + capacity``) so the newest
+    N samples of a column are always one contiguous slice, returned as a
+    memoryview without copying. Appending is O(1) and never allocates.
+    """
+
+    def __init__(self, fields, capacity=3600, typecode="d"):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.fields = list(fields)
+        self.capacity = capacity
+        self._columns = {name: array(typecode, [0.0]) * (2 * capacity) for name in self.fields}
+        self._order = [self._columns[name] for name in self.fields]
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def __iter__(self):
+        return iter(self.rows())
+
+    def append(self, *values):
+        pos = self._count % self.capacity
+        mirror = pos + self.capacity
+        for col, value in zip(self._order, values):
+            col[pos] = value
+            col[mirror] = value
+        self._count += 1
+
+    def last(self, field, n=None):
+        """View of the newest ``n`` values of ``field`` (oldest first)."""
+        size = len(self)
+        n = size if n is None else max(0, min(n, size))
+        end = (self._count - 1) % self.capacity + self.capacity + 1 if self._count else self.capacity
+        return memoryview(self._columns[field])[end - n:end]
+
+    def rows(self, n=None):
+        """Newest ``n`` samples as a list of tuples (oldest first)."""
+        return list(zip(*(self.last(name, n) for name in self.fields)))
+
+    def clear(self):
+        self._count = 0
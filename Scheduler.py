@@ -0,0 +1,94 @@
+import threading
+import time
+
+
+class Ticker:
+    """Fires at absolute deadlines on the monotonic clock.
+
+    Deadlines advance by exactly ``interval`` from the start, so the time the
+    caller spends between ticks does not accumulate as drift. If the caller
+    overruns one or more whole intervals, those deadlines are skipped (and
+    counted in ``missed``) rather than fired back to back.
+    """
+
+    def __init__(self, interval):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval = interval
+        self.ticks = 0
+        self.missed = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self._next = time.monotonic() + interval
+
+    def wait(self):
+        """Sleep until the next deadline and return the monotonic wake time."""
+        now = time.monotonic()
+        delay = self._next - now
+        if delay > 0:
+            time.sleep(delay)
+            now = time.monotonic()
+        lateness = now - self._next
+        self.last_lateness = lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        self.ticks += 1
+        self._next += self.interval
+        if self._next <= now:
+            skipped = int((now - self._next) // self.interval) + 1
+            self.missed += skipped
+            self._next += skipped * self.interval
+        return now
+
+
+class CollectorScheduler:
+    """Runs each metric collector on its own thread and cadence.
+
+    ``status`` (normally ``telemetry_data["collectors"]``) receives one entry
+    per collector with its interval, wall-clock time of the last successful
+    run, run duration, skipped deadlines and error count, so the UI can show
+    how stale each group is. A collector added with ``prime`` also runs once
+    as soon as its thread starts instead of waiting a whole interval.
+    """
+
+    def __init__(self, status):
+        self.status = status
+        self._collectors = []
+
+    def add(self, name, interval, fn, prime=False):
+        self._collectors.append((name, interval, fn, prime))
+        self.status[name] = {
+            "interval": interval,
+            "updated": 0.0,
+            "duration": 0.0,
+            "lateness": 0.0,
+            "missed": 0,
+            "errors": 0,
+            "last_error": None,
+        }
+
+    def start(self):
+        for name, interval, fn, prime in self._collectors:
+            threading.Thread(target=self._run, args=(name, interval, fn, prime), daemon=True).start()
+
+    def _run(self, name, interval, fn, prime):
+        entry = self.status[name]
+        ticker = Ticker(interval)
+        if prime:
+            self._call(entry, fn)
+        while True:
+            ticker.wait()
+            self._call(entry, fn)
+            entry["lateness"] = ticker.last_lateness
+            entry["missed"] = ticker.missed
+
+    def _call(self, entry, fn):
+        began = time.monotonic()
+        try:
+            fn()
+        except Exception as e:
+            entry["errors"] += 1
+            entry["last_error"] = str(e)
+        else:
+            entry["updated"] = time.time()
+        entry["duration"] = time.monotonic() - began
@@ -0,0 +1,802 @@
+import bisect
+import os
+import json
+import math
+import mmap
+import queue
+import re
+import struct
+import threading
+import time
+from array import array
+
+# Per-sample session fields, in record order.
+SESSION_FIELDS = ["t", "download", "upload", "latency", "jitter", "packet_loss", "cpu", "memory"]
+# Legacy JSON sessions only carry (time, download, upload).
+LEGACY_FIELDS = ["t", "download", "upload"]
+
+# Session history is kept as an append-only journal: one JSON header object
+# on the first line, then one JSON array per sample. Appending is O(1); how
+# much a crash can lose is set by the BackgroundWriter flush interval.
+JOURNAL_EXT = ".jsonl"
+
+# Columnar store: a directory holding meta.json plus one fixed-width,
+# native-endian file per field. Time is float64, metrics are float32.
+COLUMNS_EXT = ".cols"
+COLUMN_TYPECODES = {"t": "d"}
+DEFAULT_TYPECODE = "f"
+
+# Tiered store: a directory holding meta.json plus one fixed-capacity ring
+# file per tier. The raw tier keeps every sample; rollup tiers keep
+# min/mean/max/last of each metric per time bucket. Every ring has its own
+# retention, so disk and memory stay bounded however long the session runs.
+TIERS_EXT = ".tiers"
+# (name, bucket seconds, retention seconds); bucket 0 is the raw tier
+DEFAULT_TIERS = [
+    ("raw", 0, 3600),
+    ("10s", 10, 86400),
+    ("1m", 60, 7 * 86400),
+    ("1h", 3600, 365 * 86400),
+]
+ROLLUP_STATS = ["min", "mean", "max", "last"]
+MAX_PLOT_POINTS = 5000  # tier selection aims to stay under this many points
+PLOT_FIELDS = ["t", "download", "upload"]
+STREAM_CHUNK = 1 << 20  # characters read at a time from JSON snapshots
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+_RING_MAGIC = b"NBRING1\0"
+_RING_HEADER = struct.Struct("=8sQQ")  # magic, capacity, records written
+_OBJECT_LINE = re.compile(r"^[ \t]*\{.*$", re.M)  # journal metadata lines between rows
+_HISTORY_KEY = re.compile(r'"history"\s*:')
+
+
+def _flush_files(files, fsync):
+    for f in files:
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+
+class CsvLog:
+    """Human-readable (time, download, upload) log."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "a")
+        if self._f.tell() == 0:
+            self._f.write("Time (s),Download (Mbps),Upload (Mbps)\n")
+            self._f.flush()
+
+    def append(self, row):
+        self._f.write(f"{row[0]:.2f},{row[1]:.3f},{row[2]:.3f}\n")
+
+    def annotate(self, meta):
+        pass
+
+    def flush(self, fsync=False):
+        _flush_files([self._f], fsync)
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+class HistoryJournal:
+    def __init__(self, path, header=None, fields=None):
+        self.path = path
+        self._f = open(path, "a")
+        if self._f.tell() == 0:
+            head = {"fields": list(fields or SESSION_FIELDS)}
+            head.update(header or {})
+            self._f.write(json.dumps(head) + "\n")
+            self._f.flush()
+
+    def append(self, row):
+        self._f.write(json.dumps(row, separators=(",", ":")) + "\n")
+
+    def annotate(self, meta):
+        # Object lines are merged into the header by read_journal; later keys win
+        self._f.write(json.dumps(meta, separators=(",", ":")) + "\n")
+
+    def flush(self, fsync=False):
+        _flush_files([self._f], fsync)
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+def _update_meta(path, meta):
+    meta_path = os.path.join(path, "meta.json")
+    with open(meta_path, "r") as f:
+        current = json.load(f)
+    current.update(meta)
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(current, f)
+    os.replace(tmp_path, meta_path)
+
+
+class ColumnStore:
+    def __init__(self, path, header=None, fields=None):
+        self.path = path
+        self.fields = list(fields or SESSION_FIELDS)
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            meta = dict(header or {})
+            meta["fields"] = self.fields
+            meta["types"] = {name: column_typecode(name) for name in self.fields}
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        self._files = [open(os.path.join(path, f"{name}.bin"), "ab") for name in self.fields]
+        self._packers = [struct.Struct("=" + column_typecode(name)) for name in self.fields]
+
+    def annotate(self, meta):
+        _update_meta(self.path, meta)
+
+    def append(self, row):
+        for f, packer, value in zip(self._files, self._packers, row):
+            f.write(packer.pack(value))
+
+    def flush(self, fsync=False):
+        _flush_files(self._files, fsync)
+
+    def close(self):
+        for f in self._files:
+            if not f.closed:
+                f.close()
+
+
+class RingFile:
+    """Fixed-capacity file of float64 records; the oldest record is overwritten.
+
+    The header holds the capacity and the number of records ever written, so
+    a reader can tell where the ring starts.
+    """
+
+    def __init__(self, path, width, capacity):
+        self.path = path
+        self.capacity = capacity
+        self._record = struct.Struct(f"={width}d")
+        if os.path.exists(path):
+            self._f = open(path, "r+b")
+            magic, stored, self.count = _RING_HEADER.unpack(self._f.read(_RING_HEADER.size))
+            if magic != _RING_MAGIC or stored != capacity:
+                raise ValueError(f"{path}: ring layout does not match")
+        else:
+            self._f = open(path, "w+b")
+            self.count = 0
+            self._f.write(_RING_HEADER.pack(_RING_MAGIC, capacity, 0))
+            self._f.truncate(_RING_HEADER.size + capacity * self._record.size)
+
+    def append(self, values):
+        slot = self.count % self.capacity
+        self._f.seek(_RING_HEADER.size + slot * self._record.size)
+        self._f.write(self._record.pack(*values))
+        self.count += 1
+        self._f.seek(0)
+        self._f.write(_RING_HEADER.pack(_RING_MAGIC, self.capacity, self.count))
+
+    def flush(self, fsync=False):
+        _flush_files([self._f], fsync)
+
+    def close(self):
+        if not self._f.closed:
+            self._f.close()
+
+
+def tier_fields(fields, bucket):
+    if not bucket:
+        return list(fields)
+    return ["t", "count"] + [f"{name}_{stat}" for name in fields if name != "t" for stat in ROLLUP_STATS]
+
+
+class TieredStore:
+    def __init__(self, path, header=None, fields=None, tiers=None, sample_interval=1.0):
+        self.path = path
+        self.fields = list(fields or SESSION_FIELDS)
+        self.tiers = []
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                layout = json.load(f)["tiers"]
+        else:
+            layout = []
+            for name, bucket, retention in tiers or DEFAULT_TIERS:
+                step = bucket or sample_interval
+                layout.append({
+                    "name": name,
+                    "bucket": bucket,
+                    "retention": retention,
+                    "capacity": max(1, int(-(-retention // step))),
+                    "fields": tier_fields(self.fields, bucket),
+                })
+            meta = dict(header or {})
+            meta["fields"] = self.fields
+            meta["sample_interval"] = sample_interval
+            meta["tiers"] = layout
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+        for spec in layout:
+            ring = RingFile(os.path.join(path, f"{spec['name']}.ring"), len(spec["fields"]), spec["capacity"])
+            self.tiers.append({"bucket": spec["bucket"], "ring": ring, "start": None})
+
+    def append(self, row):
+        t = row[0]
+        for tier in self.tiers:
+            bucket = tier["bucket"]
+            if not bucket:
+                tier["ring"].append(row)
+                continue
+            start = t - t % bucket
+            if tier["start"] is not None and start != tier["start"]:
+                self._emit(tier)
+            if tier["start"] is None or start != tier["start"]:
+                tier["start"] = start
+                tier["count"] = 0
+                tier["min"] = list(row[1:])
+                tier["max"] = list(row[1:])
+                tier["sum"] = [0.0] * (len(row) - 1)
+            tier["count"] += 1
+            tier["last"] = row[1:]
+            mins, maxs, sums = tier["min"], tier["max"], tier["sum"]
+            for i, value in enumerate(row[1:]):
+                if value < mins[i]:
+                    mins[i] = value
+                if value > maxs[i]:
+                    maxs[i] = value
+                sums[i] += value
+
+    def _emit(self, tier):
+        n = tier["count"]
+        record = [tier["start"], n]
+        for lo, hi, total, last in zip(tier["min"], tier["max"], tier["sum"], tier["last"]):
+            record.extend((lo, total / n, hi, last))
+        tier["ring"].append(record)
+
+    def flush(self, fsync=False):
+        for tier in self.tiers:
+            tier["ring"].flush(fsync)
+
+    def annotate(self, meta):
+        _update_meta(self.path, meta)
+
+    def close(self):
+        for tier in self.tiers:
+            # Partial buckets are kept so short sessions still have rollups
+            if tier["bucket"] and tier["start"] is not None:
+                self._emit(tier)
+                tier["start"] = None
+            tier["ring"].close()
+
+
+class BackgroundWriter:
+    """Feeds session sinks from a bounded queue on a dedicated thread.
+
+    ``submit`` never blocks: when the queue is full the row is dropped and
+    counted. A dict submitted instead of a row is session metadata and is
+    handed to each sink's ``annotate`` in order with the rows. Rows are
+    written in batches to handles that stay open; they are flushed every
+    ``flush_interval`` seconds (0 = after every batch) and fsynced according
+    to ``fsync`` ("never", "interval" or "always").
+    """
+
+    _STOP = object()
+
+    def __init__(self, sinks, maxsize=4096, batch_size=256, flush_interval=1.0, fsync="never"):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._counters = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "flushes": 0,
+            "errors": 0,
+            "max_depth": 0,
+        }
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, row):
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self._counters["dropped"] += 1
+            return False
+        depth = self._queue.qsize()
+        with self._lock:
+            self._counters["submitted"] += 1
+            if depth > self._counters["max_depth"]:
+                self._counters["max_depth"] = depth
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats["depth"] = self._queue.qsize()
+        stats["capacity"] = self._queue.maxsize
+        return stats
+
+    def close(self, timeout=5.0):
+        """Drain pending rows, flush, and close every sink."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        dirty = False
+        stopping = False
+        while not stopping:
+            wait = None
+            if dirty:
+                wait = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                batch = [self._queue.get(timeout=wait)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for i, row in enumerate(batch):
+                if row is self._STOP:
+                    del batch[i:]
+                    stopping = True
+                    break
+            if batch:
+                self._write(batch)
+                dirty = True
+            now = time.monotonic()
+            due = self.fsync == "always" or now - last_flush >= self.flush_interval
+            if dirty and (stopping or due):
+                self._flush()
+                last_flush = now
+                dirty = False
+        for sink in self.sinks:
+            sink.close()
+
+    def _write(self, batch):
+        # A row that one sink rejects is still offered to the others, and
+        # counts as written only if every sink accepted it
+        failed = set()
+        for sink in self.sinks:
+            for i, row in enumerate(batch):
+                try:
+                    if isinstance(row, dict):
+                        sink.annotate(row)
+                    else:
+                        sink.append(row)
+                except Exception as e:
+                    failed.add(i)
+                    self._error(e)
+        with self._lock:
+            self._counters["written"] += len(batch) - len(failed)
+            self._counters["batches"] += 1
+
+    def _flush(self):
+        fsync = self.fsync != "never"
+        for sink in self.sinks:
+            try:
+                sink.flush(fsync)
+            except Exception as e:
+                self._error(e)
+        with self._lock:
+            self._counters["flushes"] += 1
+
+    def _error(self, e):
+        self.last_error = str(e)
+        with self._lock:
+            self._counters["errors"] += 1
+
+
+def column_typecode(name):
+    return COLUMN_TYPECODES.get(name, DEFAULT_TYPECODE)
+
+
+def parse_duration(text):
+    """Seconds from "90", "90s", "15m", "12h", "30d" or "2w"."""
+    text = text.strip().lower()
+    if text and text[-1] in DURATION_UNITS:
+        return float(text[:-1]) * DURATION_UNITS[text[-1]]
+    return float(text)
+
+
+def parse_retention(spec, tiers=None):
+    """Apply "raw=1h,10s=1d,1m=7d,1h=365d" style overrides to the tier list."""
+    retention = {name: seconds for name, _, seconds in tiers or DEFAULT_TIERS}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        if name not in retention:
+            raise ValueError(f"unknown tier {name!r}")
+        retention[name] = parse_duration(value)
+    return [(name, bucket, retention[name]) for name, bucket, _ in tiers or DEFAULT_TIERS]
+
+
+def open_session_store(base_path, fmt, header=None, tiers=None, sample_interval=1.0, fields=None):
+    """Create the history writer for ``fmt`` ("jsonl", "columns" or "tiered").
+
+    ``fields`` defaults to SESSION_FIELDS; extra per-interface columns follow them.
+    """
+    if fmt == "columns":
+        return ColumnStore(base_path + COLUMNS_EXT, header, fields)
+    if fmt == "tiered":
+        return TieredStore(base_path + TIERS_EXT, header, fields, tiers=tiers, sample_interval=sample_interval)
+    return HistoryJournal(base_path + JOURNAL_EXT, header, fields)
+
+
+def read_journal(path):
+    header = {}
+    history = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # Torn last line after a crash
+                break
+            if isinstance(rec, dict):
+                header.update(rec)
+            else:
+                history.append(rec)
+    return header, history
+
+
+def read_columns(path):
+    """Memory-map a columnar store.
+
+    Returns (meta, columns) where each column is a memoryview over the mapped
+    file, truncated to the number of complete rows across all columns.
+    """
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    fields = meta.get("fields", SESSION_FIELDS)
+    types = meta.get("types", {})
+    views = {}
+    for name in fields:
+        typecode = types.get(name, column_typecode(name))
+        col_path = os.path.join(path, f"{name}.bin")
+        size = os.path.getsize(col_path) if os.path.exists(col_path) else 0
+        if size < array(typecode).itemsize:
+            views[name] = memoryview(array(typecode))
+            continue
+        with open(col_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        itemsize = array(typecode).itemsize
+        views[name] = memoryview(mm)[:size - size % itemsize].cast(typecode)
+    rows = min((len(v) for v in views.values()), default=0)
+    return meta, {name: v[:rows] for name, v in views.items()}
+
+
+def read_ring(path, width):
+    """Columns (arrays, oldest record first) of a ring file."""
+    with open(path, "rb") as f:
+        _, capacity, count = _RING_HEADER.unpack(f.read(_RING_HEADER.size))
+        data = array("d")
+        data.frombytes(f.read(min(count, capacity) * width * 8))
+    rows = len(data) // width
+    start = count % capacity if count > capacity else 0
+    columns = []
+    for j in range(width):
+        col = data[j::width]
+        columns.append(col[start:] + col[:start] if start else col[:rows])
+    return columns
+
+
+def read_tiers(path):
+    """Return (meta, {tier name: {field: array}}) for a tiered store."""
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    tiers = {}
+    for spec in meta["tiers"]:
+        ring_path = os.path.join(path, f"{spec['name']}.ring")
+        columns = read_ring(ring_path, len(spec["fields"])) if os.path.exists(ring_path) else []
+        tiers[spec["name"]] = {name: col for name, col in zip(spec["fields"], columns)} if columns else \
+            {name: array("d") for name in spec["fields"]}
+    return meta, tiers
+
+
+def select_tier(meta, tiers, start=None, end=None, max_points=MAX_PLOT_POINTS):
+    """Name of the finest tier that still holds ``start`` and fits ``max_points``.
+
+    ``start``/``end`` are session times in seconds (None = session start/end).
+    Tiers whose retention no longer reaches back to ``start`` are skipped;
+    among the rest the finest one with at most ``max_points`` rows in range
+    wins, else the coarsest. A tier that has not yet overwritten any row
+    still holds the whole session, wherever its first row landed.
+    """
+    specs = sorted(meta["tiers"], key=lambda spec: spec["bucket"])
+    order = [spec["name"] for spec in specs]
+    since = 0.0 if start is None else start
+    covering = []
+    for spec in specs:
+        times = tiers[spec["name"]]["t"]
+        if not len(times):
+            continue
+        step = spec["bucket"] or meta.get("sample_interval", 1.0)
+        if len(times) < spec["capacity"] or times[0] <= since + step:
+            covering.append(spec["name"])
+    candidates = covering or [name for name in order if len(tiers[name]["t"])]
+    if not candidates:
+        return order[0]
+    for name in candidates:
+        times = tiers[name]["t"]
+        points = sum(1 for t in times if t >= since and (end is None or t <= end))
+        if points <= max_points:
+            return name
+    return candidates[-1]
+
+
+def load_tier(path, start=None, end=None, tier=None, max_points=MAX_PLOT_POINTS):
+    """Return (columns, ssid, tier name) from a tiered store, limited to [start, end].
+
+    Rollup tiers also expose each metric's mean under the plain metric name
+    next to its ``<metric>_min``/``_mean``/``_max``/``_last`` columns.
+    """
+    meta, tiers = read_tiers(path)
+    name = tier or select_tier(meta, tiers, start, end, max_points)
+    columns = tiers[name]
+    times = columns["t"]
+    lo = 0 if start is None else bisect.bisect_left(times, start)
+    hi = len(times) if end is None else bisect.bisect_right(times, end)
+    columns = {field: col[lo:hi] for field, col in columns.items()}
+    for field in meta.get("fields", SESSION_FIELDS):
+        if field not in columns and f"{field}_mean" in columns:
+            columns[field] = columns[f"{field}_mean"]
+    return columns, meta.get("ssid", "Unknown"), name
+
+
+def _column_targets(fields, out):
+    return [(fields.index(name), col) for name, col in out.items() if name in fields]
+
+
+def _append_rows(text, width, targets):
+    """Append the flat rows in ``text`` (numbers and brackets) to the target columns.
+
+    All rows are parsed in one pass (brackets dropped, one split, one float
+    map) and then sliced per column; nulls become NaN as in the slow path.
+    Returns False, without appending anything, if the rows are not all
+    ``width`` numbers wide.
+    """
+    text = text.replace("[", "").replace("]", "").replace("null", "nan").strip(" \t\r\n,")
+    if not text:
+        return True
+    try:
+        values = array("d", map(float, text.split(",")))
+    except ValueError:
+        return False
+    if len(values) % width:
+        return False
+    for i, col in targets:
+        col.extend(values[i::width])
+    return True
+
+
+def _append_rows_slow(rows, targets):
+    for row in rows:
+        if isinstance(row, str):
+            row = json.loads(row)
+        if isinstance(row, list) and len(row) > max((i for i, _ in targets), default=0):
+            for i, col in targets:
+                col.append(math.nan if row[i] is None else row[i])
+
+
+def _append_run(body, width, targets):
+    """Append a run of whole row lines, dropping a torn last line."""
+    body = body.rstrip()
+    if not body.endswith("]"):
+        # Torn last line after a crash
+        body = body[:body.rfind("\n") + 1]
+    if not _append_rows(body.replace("\n", ","), width, targets):
+        _append_rows_slow([line for line in body.splitlines() if line.strip()], targets)
+
+
+def _stream_journal(path, out):
+    header = {}
+    fields = None
+    targets = None
+    with open(path, "r") as f:
+        # Header lines come first; rows follow in blocks of whole lines
+        tail = ""
+        while True:
+            chunk = f.read(STREAM_CHUNK)
+            block = tail + chunk
+            if chunk:
+                cut = block.rfind("\n") + 1
+                block, tail = block[:cut], block[cut:]
+            else:
+                tail = ""
+            if not block:
+                if chunk:
+                    continue
+                break
+            if targets is not None:
+                # Metadata lines (network changes, end marker) split the block
+                # into runs of rows, each parsed in bulk
+                start = 0
+                for obj in _OBJECT_LINE.finditer(block):
+                    _append_run(block[start:obj.start()], len(fields), targets)
+                    try:
+                        rec = json.loads(obj.group())
+                    except ValueError:
+                        return header
+                    if isinstance(rec, dict):
+                        header.update(rec)
+                    start = obj.end()
+                _append_run(block[start:], len(fields), targets)
+                continue
+            for line in block.splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    return header
+                if isinstance(rec, dict):
+                    header.update(rec)
+                    continue
+                if targets is None:
+                    fields = header.get("fields", SESSION_FIELDS)
+                    targets = _column_targets(fields, out)
+                _append_rows_slow([rec], targets)
+    return header
+
+
+def _stream_snapshot(path, out):
+    with open(path, "r") as f:
+        buf = f.read(STREAM_CHUNK)
+        pos = 0
+        while True:
+            key = _HISTORY_KEY.search(buf, pos)
+            if key is None:
+                more = f.read(STREAM_CHUNK)
+                if not more:
+                    # No top-level history array at all
+                    return json.loads(buf)
+                # A key may straddle the chunk boundary
+                pos = max(pos, len(buf) - 64)
+                buf += more
+                continue
+            prefix = buf[:key.start()]
+            try:
+                # Only the top-level key leaves a prefix that closes into an
+                # object; matches in nested objects or string values do not
+                fields = json.loads(prefix + '"history": []}').get("fields", LEGACY_FIELDS)
+                break
+            except ValueError:
+                pos = key.end()
+        targets = _column_targets(fields, out)
+        buf = buf[buf.index("[", key.end()) + 1:]
+        # History rows are flat arrays, so the first "]" followed by "]" closes it
+        while True:
+            close = re.search(r"\]\s*\]", buf)
+            if close is None and buf.lstrip().startswith("]"):
+                close = re.match(r"\s*()\]", buf)
+            if close is not None:
+                body, buf = buf[:close.start() + 1], buf[close.end():]
+            else:
+                cut = buf.rfind("]") + 1
+                body, buf = buf[:cut], buf[cut:]
+            if body and not _append_rows(body, len(fields), targets):
+                _append_rows_slow(json.loads("[" + body.strip(" \t\r\n,") + "]"), targets)
+            if close is not None:
+                break
+            more = f.read(STREAM_CHUNK)
+            if not more:
+                raise ValueError(f"{path}: unterminated history array")
+            buf += more
+        suffix = buf + f.read()
+    header = json.loads(prefix + '"history": []' + suffix)
+    header.pop("history", None)
+    return header
+
+
+def stream_columns(path, fields=PLOT_FIELDS):
+    """Return (columns, ssid) holding only ``fields``.
+
+    Journals are read line by line and JSON snapshots element by element
+    straight into float64 arrays, so no list-of-rows copy of the session is
+    ever built. Columnar and tiered stores are returned as they load.
+    """
+    path = path.rstrip("/\\")
+    if path.endswith((COLUMNS_EXT, TIERS_EXT)):
+        columns, ssid = load_columns(path)
+        return {name: columns[name] for name in fields if name in columns}, ssid
+    out = {name: array("d") for name in fields}
+    if path.endswith(JOURNAL_EXT):
+        header = _stream_journal(path, out)
+    else:
+        header = _stream_snapshot(path, out)
+    rows = min((len(col) for col in out.values()), default=0)
+    return {name: col[:rows] if len(col) > rows else col for name, col in out.items()}, header.get("ssid", "Unknown")
+
+
+def _journal_lines(f):
+    """Yield (line, is_row) for the complete lines of a journal; stops at a torn line."""
+    for line in f:
+        text = line.strip()
+        if not text:
+            continue
+        if text[0] == "[" and text[-1] == "]" and line.endswith("\n"):
+            # Rows are flat arrays written whole, so they are copied without parsing
+            yield text, True
+            continue
+        try:
+            rec = json.loads(text)
+        except ValueError:
+            # Torn last line after a crash
+            return
+        yield rec, not isinstance(rec, dict)
+
+
+def write_snapshot(journal_path, json_path):
+    """Compact the journal into a regular JSON session file (atomic replace).
+
+    Two streaming passes: the first merges the header objects, the second
+    copies the row lines into the history array, so memory stays constant
+    however long the session is.
+    """
+    header = {}
+    with open(journal_path, "r") as f:
+        for rec, is_row in _journal_lines(f):
+            if not is_row:
+                header.update(rec)
+    tmp_path = json_path + ".tmp"
+    with open(journal_path, "r") as src, open(tmp_path, "w") as out:
+        head = json.dumps(header)
+        out.write(head[:-1] + (", " if header else "") + '"history": [')
+        first = True
+        for rec, is_row in _journal_lines(src):
+            if not is_row:
+                continue
+            if not first:
+                out.write(", ")
+            out.write(rec if isinstance(rec, str) else json.dumps(rec))
+            first = False
+        out.write("]}")
+    os.replace(tmp_path, json_path)
+
+
+def load_history(path):
+    """Return (header, history rows) from a journal or a JSON snapshot."""
+    if path.endswith(JOURNAL_EXT):
+        return read_journal(path)
+    with open(path, "r") as f:
+        data = json.load(f)
+    history = data.pop("history", [])
+    if not isinstance(history, list):
+        history = []
+    data.setdefault("fields", LEGACY_FIELDS)
+    return data, history
+
+
+def load_columns(path):
+    """Return (columns, ssid) for any session format.
+
+    Columnar stores are memory-mapped; text formats are transposed into lists.
+    """
+    path = path.rstrip("/\\")
+    if path.endswith(TIERS_EXT):
+        columns, ssid, _ = load_tier(path)
+        return columns, ssid
+    if path.endswith(COLUMNS_EXT):
+        meta, columns = read_columns(path)
+        return columns, meta.get("ssid", "Unknown")
+    header, history = load_history(path)
+    fields = header.get("fields", LEGACY_FIELDS)
+    columns = {name: [row[i] for row in history if len(row) > i] for i, name in enumerate(fields)}
+    return columns, header.get("ssid", "Unknown")
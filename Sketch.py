@@ -0,0 +1,104 @@
+import math
+from array import array
+
+
+class QuantileSketch:
+    """Fixed-memory quantile sketch with relative error guarantees.
+
+    Positive values are counted in logarithmic buckets whose bounds grow by
+    ``gamma = (1 + a) / (1 - a)``, so any quantile is returned within a
+    relative error ``a`` (``relative_accuracy``) of the true value. Values at
+    or below ``min_value`` fall in a single zero bucket and values above
+    ``max_value`` are clamped into the last bucket. ``add`` is O(1) and the
+    bucket array is allocated once, so a week-long session costs the same
+    memory as a minute.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-3, max_value=1e7):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._offset = math.ceil(math.log(min_value) / self._log_gamma)
+        size = math.ceil(math.log(max_value) / self._log_gamma) - self._offset + 1
+        self._bins = array("Q", [0]) * size
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma) - self._offset
+        self._bins[min(index, len(self._bins) - 1)] += 1
+
+    def quantile(self, q):
+        """Value at quantile ``q`` (0..1), or 0.0 for an empty sketch."""
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index, n in enumerate(self._bins):
+            seen += n
+            if rank < seen:
+                # Midpoint (in relative terms) of the bucket (gamma^(i-1), gamma^i]
+                value = 2 * self.gamma ** (index + self._offset) / (1 + self.gamma)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def merge(self, other):
+        if (other.relative_accuracy, other.min_value, other.max_value) != (
+                self.relative_accuracy, self.min_value, self.max_value):
+            raise ValueError("sketches must share accuracy and range to merge")
+        for index, n in enumerate(other._bins):
+            if n:
+                self._bins[index] += n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self):
+        """JSON-ready form; only non-empty buckets are stored."""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "max_value": self.max_value,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "zero_count": self.zero_count,
+            "bins": [[index, n] for index, n in enumerate(self._bins) if n],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"], data["min_value"], data["max_value"])
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        sketch.zero_count = data["zero_count"]
+        for index, n in data["bins"]:
+            sketch._bins[index] = n
+        return sketch
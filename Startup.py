@@ -0,0 +1,77 @@
+import time
+
+_started = time.perf_counter()
+
+import importlib
+import sys
+import threading
+
+# Startup timing for --profile-startup. Import this module first so the
+# clock starts before the other imports. Modules that are only needed later
+# in a background thread (speedtest, requests) go through lazy_import so
+# their cost is paid, and recorded, at first use instead of at launch.
+
+
+class StartupProfile:
+    def __init__(self):
+        self.marks = []  # (phase, ms since the previous mark, ms since start)
+        self.deferred = {}  # module -> (import ms, ms since start)
+        self._last = _started
+        self._seen = set()
+        self._cond = threading.Condition()
+
+    def mark(self, phase):
+        with self._cond:
+            now = time.perf_counter()
+            self.marks.append((phase, (now - self._last) * 1000, (now - _started) * 1000))
+            self._last = now
+            self._seen.add(phase)
+            self._cond.notify_all()
+
+    def mark_once(self, phase):
+        if phase not in self._seen:
+            self.mark(phase)
+
+    def wait_for(self, phase, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: phase in self._seen, timeout)
+
+    def lazy_import(self, name):
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        began = time.perf_counter()
+        module = importlib.import_module(name)
+        now = time.perf_counter()
+        self.deferred.setdefault(name, ((now - began) * 1000, (now - _started) * 1000))
+        return module
+
+    def table(self, heavy=("rich.live", "requests", "speedtest", "numpy", "matplotlib")):
+        from rich.table import Table
+        import psutil
+        tbl = Table(title="Startup Profile")
+        tbl.add_column("Phase", style="cyan")
+        tbl.add_column("ms", justify="right")
+        tbl.add_column("at ms", justify="right", style="dim")
+        for phase, took, at in self.marks:
+            tbl.add_row(phase, f"{took:.1f}", f"{at:.1f}")
+        for name, (took, at) in self.deferred.items():
+            tbl.add_row(f"lazy import {name}", f"{took:.1f}", f"{at:.1f}")
+        loaded = [name for name in heavy if name in sys.modules]
+        deferred = [name for name in heavy if name not in sys.modules]
+        tbl.add_row("loaded", ", ".join(loaded) or "-", "")
+        tbl.add_row("not loaded yet", ", ".join(deferred) or "-", "")
+        tbl.add_row("RSS", f"{psutil.Process().memory_info().rss / (1024 ** 2):.1f} MB", "")
+        return tbl
+
+
+def install_traceback():
+    """Rich tracebacks, with rich.traceback imported only when one is shown."""
+    def excepthook(*exc_info):
+        from rich.traceback import install
+        install()
+        sys.excepthook(*exc_info)
+    sys.excepthook = excepthook
+
+
+startup = StartupProfile()
@@ -0,0 +1,558 @@
+import asyncio
+import json
+import socket
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urljoin, urlparse
+from ProcNet import tcp_info_bytes
+
+DEFAULT_DOWNLOAD_URLS = [
+    "https://commondatastorage.googleapis.com/gtv-videos-bucket/sample/BigBuckBunny.mp4",
+]
+CHUNK_SIZE = 1024 * 1024
+LOCAL_OBJECT_SIZE = 1024 ** 3  # bytes served per GET by the local server
+DEFAULT_UPLOAD_URL = "https://httpbin.org/post"
+UPLOAD_OBJECT_SIZE = 8 * 1024 * 1024  # bytes per chunked POST
+ASYNC_READ_SIZE = 64 * 1024
+ZEROCOPY_BUFFER_SIZE = 256 * 1024  # per-connection receive buffer in zerocopy mode
+MAX_HEADER_SIZE = 64 * 1024
+
+
+class _EngineStats:
+    """Byte/error counters per stream plus the CPU time the engine burns.
+
+    ``cpu_clock`` returns cumulative CPU seconds attributable to the engine;
+    cpu_per_gbps is CPU percent (100 = one core) per Gbps moved.
+    """
+
+    def __init__(self, streams):
+        self.streams = streams
+        self._bytes = [0] * streams
+        self._errors = [0] * streams
+        self._last_bytes = [0] * streams
+        self._last_sample = time.monotonic()
+        self._last_cpu = self.cpu_clock()
+
+    def cpu_clock(self):
+        return time.process_time()
+
+    def sample(self):
+        """Per-stream and aggregate rates (bps) since the previous call."""
+        now = time.monotonic()
+        cpu = self.cpu_clock()
+        elapsed = max(now - self._last_sample, 1e-9)
+        current = list(self._bytes)
+        rates = [(cur - old) * 8 / elapsed for cur, old in zip(current, self._last_bytes)]
+        cpu_pct = (cpu - self._last_cpu) / elapsed * 100
+        self._last_bytes = current
+        self._last_sample = now
+        self._last_cpu = cpu
+        aggregate = sum(rates)
+        return {
+            "aggregate_bps": aggregate,
+            "streams": rates,
+            "bytes": sum(current),
+            "errors": sum(self._errors),
+            "cpu_pct": cpu_pct,
+            "cpu_per_gbps": cpu_pct / (aggregate / 1e9) if aggregate else 0.0,
+            "bytes_per_cpu_pct": aggregate / 8 / cpu_pct if cpu_pct > 0 else 0.0,
+        }
+
+
+class DownloadEngine(_EngineStats):
+    """N concurrent HTTP download streams with an optional aggregate rate cap.
+
+    Each stream runs on its own thread with its own session and loops over
+    ``urls`` (stream i starts at url i mod len(urls)). ``target_bps`` caps
+    the aggregate rate, split evenly across streams; 0 means unlimited.
+    CPU cost is measured for the whole process.
+    """
+
+    def __init__(self, urls, streams=4, target_bps=0.0, chunk_size=CHUNK_SIZE):
+        super().__init__(streams)
+        self.urls = list(urls)
+        self.target_bps = target_bps
+        self.chunk_size = chunk_size
+        self._stop = threading.Event()
+
+    def start(self):
+        for idx in range(self.streams):
+            threading.Thread(target=self._worker, args=(idx,), daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _worker(self, idx):
+        import requests  # only needed once a download engine runs
+        session = requests.Session()
+        per_stream_bps = self.target_bps / self.streams if self.target_bps else 0.0
+        turn = idx
+        while not self._stop.is_set():
+            url = self.urls[turn % len(self.urls)]
+            turn += 1
+            try:
+                with session.get(url, stream=True, timeout=30) as r:
+                    r.raise_for_status()
+                    began = time.monotonic()
+                    received = 0
+                    for chunk in r.iter_content(chunk_size=self.chunk_size):
+                        if self._stop.is_set():
+                            return
+                        received += len(chunk)
+                        self._bytes[idx] += len(chunk)
+                        if per_stream_bps:
+                            # Sleep until this stream is back under its share of the target
+                            delay = began + received * 8 / per_stream_bps - time.monotonic()
+                            if delay > 0:
+                                time.sleep(delay)
+            except Exception:
+                self._errors[idx] += 1
+                time.sleep(2)  # Retry delay jika error
+
+
+class AsyncTrafficEngine(_EngineStats):
+    """Many HTTP/1.1 connections driven from one asyncio event loop.
+
+    ``mode`` is "download" (GET ``urls`` in a keep-alive loop) or "upload"
+    (chunked POSTs of ``upload_size`` bytes streamed from one shared buffer).
+    Each connection reads at most ASYNC_READ_SIZE bytes at a time, so memory
+    stays bounded regardless of the connection count. The loop runs on a
+    dedicated thread and CPU cost is that thread's CPU time only.
+
+    Upload bytes are counted as acknowledged by the peer (tcp_info
+    bytes_acked) where the platform exposes it, else as written.
+
+    With ``recv_mode="zerocopy"`` downloads skip StreamReader: every
+    connection receives straight into one preallocated buffer through a
+    BufferedProtocol, issuing one ``Connection: close`` GET per connection
+    and counting everything after the response headers. ``rcvbuf`` and
+    ``sndbuf`` set SO_RCVBUF/SO_SNDBUF before connecting (0 = OS default).
+    """
+
+    def __init__(self, urls, streams=4, mode="download", target_bps=0.0, upload_size=UPLOAD_OBJECT_SIZE,
+                 recv_mode="stream", rcvbuf=0, sndbuf=0):
+        self._cpu_seconds = 0.0
+        super().__init__(streams)
+        self.urls = list(urls)
+        self.mode = mode
+        self.target_bps = target_bps
+        self.upload_size = upload_size
+        self.recv_mode = recv_mode
+        self.rcvbuf = rcvbuf
+        self.sndbuf = sndbuf
+        self._payload = memoryview(b"x" * CHUNK_SIZE)
+        self._acked_base = [0] * streams
+        self._socks = {}
+        self._buffers = {}
+        self._loop = None
+        self._stop = None
+        self._thread = None
+
+    def cpu_clock(self):
+        return self._cpu_seconds
+
+    def start(self):
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        tasks = [asyncio.create_task(self._connection(idx)) for idx in range(self.streams)]
+        while not self._stop.is_set():
+            self._cpu_seconds = time.thread_time()
+            for idx in list(self._socks):
+                self._refresh_acked(idx)
+            try:
+                await asyncio.wait_for(self._stop.wait(), 0.25)
+            except asyncio.TimeoutError:
+                pass
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._cpu_seconds = time.thread_time()
+
+    def _refresh_acked(self, idx):
+        sock = self._socks.get(idx)
+        counters = tcp_info_bytes(sock) if sock is not None else None
+        if counters is not None:
+            self._bytes[idx] = self._acked_base[idx] + counters[0]
+
+    def _track(self, idx, writer):
+        sock = writer.get_extra_info("socket")
+        if self.mode == "upload" and sock is not None and tcp_info_bytes(sock) is not None:
+            self._socks[idx] = sock
+
+    def _untrack(self, idx):
+        if idx in self._socks:
+            self._refresh_acked(idx)
+            del self._socks[idx]
+            self._acked_base[idx] = self._bytes[idx]
+
+    async def _connection(self, idx):
+        per_stream_bps = self.target_bps / self.streams if self.target_bps else 0.0
+        pacer = [time.monotonic(), 0]
+        turn = idx
+        while not self._stop.is_set():
+            url = self.urls[turn % len(self.urls)]
+            turn += 1
+            writer = None
+            try:
+                if self.mode == "download" and self.recv_mode == "zerocopy":
+                    for _ in range(5):
+                        location = await self._zerocopy_get(idx, url, per_stream_bps, pacer)
+                        if not location:
+                            break
+                        url = urljoin(url, location)
+                    continue
+                for _ in range(5):
+                    reader, writer, target = await _open_http(url, self.rcvbuf, self.sndbuf)
+                    self._track(idx, writer)
+                    location = await self._exchange(idx, reader, writer, target, per_stream_bps, pacer)
+                    if not location:
+                        break
+                    self._untrack(idx)
+                    writer.close()
+                    url = urljoin(url, location)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._errors[idx] += 1
+                await asyncio.sleep(2)  # Retry delay jika error
+            finally:
+                self._untrack(idx)
+                if writer is not None:
+                    writer.close()
+
+    async def _zerocopy_get(self, idx, url, per_stream_bps, pacer):
+        """One GET received via recv_into; return a redirect location if any."""
+        loop = asyncio.get_running_loop()
+        if idx not in self._buffers:
+            self._buffers[idx] = memoryview(bytearray(ZEROCOPY_BUFFER_SIZE))
+
+        def on_bytes(n):
+            self._bytes[idx] += n
+            if per_stream_bps:
+                pacer[1] += n
+                return pacer[0] + pacer[1] * 8 / per_stream_bps - time.monotonic()
+            return 0.0
+
+        parts = urlparse(url)
+        sock, secure = await _connect_socket(parts, self.rcvbuf, self.sndbuf)
+        protocol = _ZeroCopyReceiver(self._buffers[idx], on_bytes, loop.create_future())
+        transport, _ = await loop.create_connection(
+            lambda: protocol, sock=sock,
+            ssl=ssl.create_default_context() if secure else None,
+            server_hostname=parts.hostname if secure else None,
+        )
+        try:
+            host, path = _request_target(parts)
+            transport.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+            stop = asyncio.ensure_future(self._stop.wait())
+            await asyncio.wait([protocol.done, stop], return_when=asyncio.FIRST_COMPLETED)
+            stop.cancel()
+            if not protocol.done.done():
+                return None
+            protocol.done.result()
+        finally:
+            transport.close()
+        if protocol.status >= 400:
+            raise ConnectionError(f"HTTP {protocol.status}")
+        return protocol.location
+
+    async def _exchange(self, idx, reader, writer, target, per_stream_bps, pacer):
+        """Run requests on one keep-alive connection; return a redirect location if any."""
+        host, path = target
+        while not self._stop.is_set():
+            if self.mode == "upload":
+                writer.write(
+                    f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+                    f"Content-Type: application/octet-stream\r\nTransfer-Encoding: chunked\r\n\r\n".encode()
+                )
+                remaining = self.upload_size
+                while remaining > 0 and not self._stop.is_set():
+                    n = min(remaining, len(self._payload))
+                    writer.write(b"%x\r\n" % n)
+                    writer.write(self._payload[:n])
+                    writer.write(b"\r\n")
+                    await writer.drain()
+                    remaining -= n
+                    if idx not in self._socks:
+                        self._bytes[idx] += n
+                    await _pace(pacer, n, per_stream_bps)
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            else:
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+                await writer.drain()
+            status, headers = await _read_head(reader)
+            if 300 <= status < 400 and "location" in headers:
+                return headers["location"]
+            if status >= 400:
+                raise ConnectionError(f"HTTP {status}")
+
+            async def count(n):
+                if self.mode == "download":
+                    self._bytes[idx] += n
+                    await _pace(pacer, n, per_stream_bps)
+
+            await _read_body(reader, headers, count)
+            if headers.get("connection", "").lower() == "close":
+                return None
+        return None
+
+
+async def _pace(pacer, n, bps):
+    if not bps:
+        return
+    pacer[1] += n
+    delay = pacer[0] + pacer[1] * 8 / bps - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+class _ZeroCopyReceiver(asyncio.BufferedProtocol):
+    """Receives one close-delimited HTTP response into a caller-owned buffer."""
+
+    def __init__(self, buffer, on_bytes, done):
+        self.buffer = buffer
+        self.on_bytes = on_bytes
+        self.done = done
+        self.head = bytearray()
+        self.status = 0
+        self.location = None
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def get_buffer(self, sizehint):
+        return self.buffer
+
+    def buffer_updated(self, nbytes):
+        if self.status:
+            self._body(nbytes)
+            return
+        # Only the header phase copies; it is a few hundred bytes per connection
+        self.head += self.buffer[:nbytes]
+        end = self.head.find(b"\r\n\r\n")
+        if end < 0:
+            if len(self.head) > MAX_HEADER_SIZE:
+                self.transport.abort()
+            return
+        lines = self.head[:end].decode("latin-1").split("\r\n")
+        self.status = int(lines[0].split()[1])
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "location":
+                self.location = value.strip()
+        if self.location and 300 <= self.status < 400:
+            self.transport.close()
+            return
+        self.location = None
+        body = len(self.head) - end - 4
+        if body:
+            self._body(body)
+
+    def _body(self, nbytes):
+        delay = self.on_bytes(nbytes)
+        if delay > 0:
+            # Rate cap: stop reading from the socket until this stream is back on budget
+            self.transport.pause_reading()
+            asyncio.get_running_loop().call_later(delay, self._resume)
+
+    def _resume(self):
+        if not self.transport.is_closing():
+            self.transport.resume_reading()
+
+    def eof_received(self):
+        return False
+
+    def connection_lost(self, exc):
+        if self.done.done():
+            return
+        if exc is not None:
+            self.done.set_exception(exc)
+        elif not self.status:
+            self.done.set_exception(ConnectionError("connection closed before response"))
+        else:
+            self.done.set_result(None)
+
+
+def _request_target(parts):
+    host = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return host, path
+
+
+async def _connect_socket(parts, rcvbuf=0, sndbuf=0):
+    """Non-blocking connected socket with buffer sizes set before the handshake."""
+    loop = asyncio.get_running_loop()
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    infos = await loop.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    error = None
+    for family, type_, proto, _, addr in infos:
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if rcvbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+            if sndbuf:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, sndbuf)
+            await loop.sock_connect(sock, addr)
+            return sock, secure
+        except OSError as e:
+            sock.close()
+            error = e
+    raise error or OSError(f"cannot resolve {parts.hostname}")
+
+
+async def _open_http(url, rcvbuf=0, sndbuf=0):
+    parts = urlparse(url)
+    sock, secure = await _connect_socket(parts, rcvbuf, sndbuf)
+    reader, writer = await asyncio.open_connection(
+        sock=sock,
+        ssl=ssl.create_default_context() if secure else None,
+        server_hostname=parts.hostname if secure else None,
+        limit=ASYNC_READ_SIZE,
+    )
+    return reader, writer, _request_target(parts)
+
+
+async def _read_head(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, headers
+
+
+async def _read_body(reader, headers, count):
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            await _read_exact(reader, size, count)
+            await reader.readline()
+    elif "content-length" in headers:
+        await _read_exact(reader, int(headers["content-length"]), count)
+    else:
+        while True:
+            data = await reader.read(ASYNC_READ_SIZE)
+            if not data:
+                return
+            await count(len(data))
+
+
+async def _read_exact(reader, size, count):
+    remaining = size
+    while remaining > 0:
+        data = await reader.read(min(remaining, ASYNC_READ_SIZE))
+        if not data:
+            raise ConnectionError("connection closed mid-body")
+        remaining -= len(data)
+        await count(len(data))
+
+
+class _LocalHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    payload = memoryview(bytes(CHUNK_SIZE))
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        size = int(query.get("bytes", [LOCAL_OBJECT_SIZE])[0])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.end_headers()
+        remaining = size
+        try:
+            while remaining > 0:
+                n = min(remaining, len(self.payload))
+                self.wfile.write(self.payload[:n])
+                remaining -= n
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_POST(self):
+        # Upload sink: discard the body into one reusable buffer
+        received = 0
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                received += self._discard(size)
+                self.rfile.readline()
+        else:
+            received = self._discard(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"received": received}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _discard(self, size):
+        if not hasattr(self, "_sink"):
+            self._sink = memoryview(bytearray(CHUNK_SIZE))
+        remaining = size
+        while remaining > 0:
+            n = self.rfile.readinto(self._sink[:min(remaining, len(self._sink))])
+            if not n:
+                raise ConnectionError("connection closed mid-body")
+            remaining -= n
+        return size
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_local_server(host="127.0.0.1", port=0):
+    """Serve zero-filled objects (GET /download?bytes=N) and sink uploads
+    (POST /upload) over HTTP for offline tests.
+
+    Returns (server, base_url); ``server.shutdown()`` stops it.
+    """
+    server = ThreadingHTTPServer((host, port), _LocalHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+_local_server = None
+
+
+def local_server_url():
+    """Base URL of a process-wide local server, started on first use."""
+    global _local_server
+    if _local_server is None:
+        _local_server = start_local_server()
+    return _local_server[1]